@@ -0,0 +1,59 @@
+# Benchmarks message header recognition on a generated chat.
+#
+# Usage: python benchmarks/bench_headers.py [--lines N] [--format iso|eu|us|de]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from synthetic import GenerateChat
+from synthetic import HEADER_LAYOUTS
+from internal.converter import isDate
+from internal.converter import ParseChat
+
+def DateutilHeaders(inputPath):
+    # The original approach: dateutil on every line containing " - ".
+    headers = 0
+    with open(inputPath, "r", encoding='utf-8') as waFile:
+        for line in waFile:
+            split = line.split(' - ', 1)
+            if len(split) == 2 and isDate(split[0]):
+                headers += 1
+    return headers
+
+class MessageCounter:
+    def __init__(self):
+        self.messages = 0
+
+    def open(self):
+        return True
+
+    def consume(self, message):
+        self.messages += 1
+
+    def close(self):
+        pass
+
+def CompiledHeaders(inputPath):
+    # The path the poster takes: the mapped file is split at its headers a block at a time.
+    counter = MessageCounter()
+    ParseChat(inputPath, [counter])
+    return counter.messages
+
+parser = argparse.ArgumentParser(description='Benchmarks dateutil against compiled header recognition.')
+parser.add_argument('--lines', dest='lines', type=int, default=1000000, help='number of lines to generate')
+parser.add_argument('--format', dest='format', default='iso', choices=sorted(HEADER_LAYOUTS), help='date format of the headers')
+args = parser.parse_args()
+
+with tempfile.TemporaryDirectory() as tempDir:
+    chatPath = tempDir + "/chat.txt"
+    GenerateChat(chatPath, args.lines, args.format)
+
+    for name, function in (("dateutil", DateutilHeaders), ("compiled", CompiledHeaders)):
+        start = time.perf_counter()
+        headers = function(chatPath)
+        elapsed = time.perf_counter() - start
+        print("{:10} {:>10} headers {:>8.2f}s {:>12,.0f} lines/s".format(name, headers, elapsed, args.lines / elapsed))
@@ -0,0 +1,227 @@
+# Benchmarks every stage of making a poster on a generated chat, offline.
+#
+# Usage: python benchmarks/bench_pipeline.py [--lines N] [--people N] [--emoji-rate R]
+#                                            [--output results.json] [--compare baseline.json]
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+rootDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, rootDir)
+
+from synthetic import GenerateChat
+from synthetic import HEADER_LAYOUTS
+
+def Revision():
+    """
+    Returns the commit the repository is at, or unknown outside of git.
+    """
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=rootDir,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    except OSError:
+        return "unknown"
+    return result.stdout.strip() or "unknown"
+
+def blockRemoteFetches(renderer):
+    # The templates link to web fonts. Fail them at once, as WeasyPrint does offline, instead of waiting on the network.
+    fetch = renderer.urlFetcher.fetch
+    def offlineFetch(url, headers=None):
+        if url.startswith(('http:', 'https:')):
+            raise OSError("Remote resources are not fetched when benchmarking: " + url)
+        return fetch(url, headers)
+    renderer.urlFetcher.fetch = offlineFetch
+
+def PipelineStages(chatPath, tempDir, template, state):
+    """
+    Lists each stage of making a poster as a name and a function that
+    runs it. Stages are run in order, as later ones use what earlier
+    ones write.
+
+    :param string: chatPath, path of the flat file
+    :param string: tempDir, directory the stages write to
+    :param string: template, the name of the template in the templates folder to use
+    :param dict: state, filled with the message table and PDF renderer as the stages run
+    """
+    from internal.converter import ConvertToTextualCSV
+    from internal.converter import ConvertToEmojiCSV
+    from internal.converter import ConvertToMessageFrame
+    from internal.canalysis import ScoreMessageSentiments
+    from internal.canalysis import GenerateWordUseFrequency
+    from internal.canalysis import GenerateTextingFrequency
+    from internal.canalysis import GenerateMessageSentimateProportion
+    from internal.wordcloud import GenerateWordCloud
+    from internal.wordcloud import GenerateEmojiWordCloud
+    from internal.incremental import SummarizeMessages
+    from internal.poster import DateIndex
+    from internal.poster import CreateValueDictionary
+    from internal.pdfgen import PrepareHTML
+    from internal.pdfgen import ConvertHTMLToPDF
+    from internal.pdfgen import GetPDFRenderer
+
+    def messageFrame():
+        state['df'] = ConvertToMessageFrame(chatPath)
+        return state['df'] is not None
+
+    def prepareHTML():
+        df = state['df']
+        valueDict = CreateValueDictionary(SummarizeMessages(df), DateIndex(df['day']))
+        return PrepareHTML(template, valueDict, tempDir)
+
+    def convertHTMLToPDF():
+        if 'renderer' not in state:
+            state['renderer'] = GetPDFRenderer()
+            blockRemoteFetches(state['renderer'])
+        return ConvertHTMLToPDF(tempDir, tempDir + "/poster.pdf")
+
+    return [
+        ("ConvertToTextualCSV", lambda: ConvertToTextualCSV(chatPath, tempDir + "/textual.csv")),
+        ("ConvertToEmojiCSV", lambda: ConvertToEmojiCSV(chatPath, tempDir + "/emoji.csv")),
+        ("ConvertToMessageFrame", messageFrame),
+        ("ScoreMessageSentiments", lambda: ScoreMessageSentiments(state['df'].message.fillna("").tolist()) is not None),
+        ("GenerateWordCloud", lambda: GenerateWordCloud(state['df'], tempDir)),
+        ("GenerateEmojiWordCloud", lambda: GenerateEmojiWordCloud(tempDir + "/emoji.csv", tempDir)),
+        ("GenerateWordUseFrequency", lambda: GenerateWordUseFrequency(state['df'], tempDir)),
+        ("GenerateTextingFrequency", lambda: GenerateTextingFrequency(state['df'], tempDir)),
+        ("GenerateMessageSentimateProportion", lambda: GenerateMessageSentimateProportion(state['df'], tempDir)),
+        ("PrepareHTML", prepareHTML),
+        ("ConvertHTMLToPDF", convertHTMLToPDF),
+    ]
+
+def WarmLibraries():
+    # Load the libraries every poster uses, so the first run of a stage does not pay for them.
+    from internal.canalysis import ScoreMessageSentiments
+    from internal.figures import loadMatplotlib
+    from internal.wordcloud import LoadMask
+    from internal.wordcloud import contractionParts
+    from internal.wordcloud import maskLocation
+
+    ScoreMessageSentiments(["warm"])
+    loadMatplotlib()
+    LoadMask(maskLocation)
+    contractionParts()
+
+def RunStage(function, runs, memory):
+    """
+    Runs a stage and returns the fastest of its wall times in seconds
+    and the peak memory allocated by one more run, in bytes. Sentiment
+    scores are forgotten before each run so every run scores the chat.
+
+    :param function: function, stage to run, returning False on failure
+    :param int: runs, number of timed runs
+    :param bool: memory, whether to measure peak memory
+    """
+    from internal.canalysis import scoreCleanedMessage
+
+    times = []
+    for _ in range(runs):
+        scoreCleanedMessage.cache_clear()
+        start = time.perf_counter()
+        if function() is False:
+            raise RuntimeError("the stage reported a failure")
+        times.append(time.perf_counter() - start)
+
+    peak = None
+    if memory:
+        scoreCleanedMessage.cache_clear()
+        tracemalloc.start()
+        try:
+            function()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return min(times), peak
+
+def CompareResults(results, baseline):
+    """
+    Prints the time of each stage against a baseline run.
+
+    :param dict: results, results of this run
+    :param dict: baseline, results loaded from an earlier run
+    """
+    print()
+    print("Compared with {} ({}):".format(baseline.get('revision', 'unknown'), baseline.get('date', 'unknown')))
+    if baseline.get('chat') != results['chat']:
+        print("    The chats differ, so the times are not directly comparable.")
+    for name, stage in results['stages'].items():
+        before = baseline.get('stages', {}).get(name, {})
+        if 'seconds' not in stage or 'seconds' not in before:
+            print("    {:36} {:>10}".format(name, "n/a"))
+            continue
+        print("    {:36} {:>8.3f}s -> {:>8.3f}s {:>7.2f}x".format(name, before['seconds'], stage['seconds'],
+                                                                  before['seconds'] / max(stage['seconds'], 1e-9)))
+
+parser = argparse.ArgumentParser(description='Benchmarks each stage of making a poster on a generated chat.')
+parser.add_argument('--lines', dest='lines', type=int, default=100000, help='number of lines in the generated chat')
+parser.add_argument('--format', dest='format', default='iso', choices=sorted(HEADER_LAYOUTS), help='date format of the headers')
+parser.add_argument('--people', dest='people', type=int, default=2, help='number of people in the chat')
+parser.add_argument('--emoji-rate', dest='emojiRate', type=float, default=0.05, help='chance of each word being followed by an emoji')
+parser.add_argument('--multiline-rate', dest='multilineRate', type=float, default=0.1, help='chance of a message continuing on another line')
+parser.add_argument('--seed', dest='seed', type=int, default=0, help='random seed of the generated chat')
+parser.add_argument('--template', dest='template', default='Template1', help='the name of the template in the templates folder to use')
+parser.add_argument('--runs', dest='runs', type=int, default=3, help='number of times each stage is timed')
+parser.add_argument('--no-memory', dest='memory', action='store_false', help='skip measuring the peak memory of each stage')
+parser.add_argument('--output', dest='output', default='bench_pipeline.json', help='JSON file the results are written to')
+parser.add_argument('--compare', dest='compare', help='JSON results of an earlier run to compare against')
+args = parser.parse_args()
+
+outputPath = os.path.abspath(args.output)
+baseline = None
+if args.compare is not None:
+    with open(args.compare, "r") as baselineFile:
+        baseline = json.load(baselineFile)
+
+# The poster code finds its templates, masks and word lists from the repository root.
+os.chdir(rootDir)
+
+with tempfile.TemporaryDirectory() as tempDir:
+    chatPath = tempDir + "/chat.txt"
+    GenerateChat(chatPath, args.lines, args.format, args.seed, args.people, args.emojiRate, args.multilineRate)
+    WarmLibraries()
+
+    stages = {}
+    state = {}
+    for name, function in PipelineStages(chatPath, tempDir, args.template, state):
+        try:
+            seconds, peak = RunStage(function, args.runs, args.memory)
+        except Exception as error:
+            # WeasyPrint needs system libraries that may be missing, so one stage failing does not stop the rest.
+            stages[name] = {'error': repr(error)}
+            print("{:36} failed: {!r}".format(name, error))
+            continue
+
+        stages[name] = {'seconds': seconds}
+        if peak is not None:
+            stages[name]['peakMiB'] = peak / (1 << 20)
+        print("{:36} {:>8.3f}s {:>10}".format(name, seconds, "" if peak is None else "{:.1f} MiB".format(peak / (1 << 20))))
+
+    chatBytes = os.path.getsize(chatPath)
+    messages = state['df'].shape[0] if state.get('df') is not None else 0
+
+for stage in stages.values():
+    if 'seconds' in stage:
+        stage['messagesPerSecond'] = messages / max(stage['seconds'], 1e-9)
+
+results = {
+    'revision': Revision(),
+    'date': datetime.now().isoformat(timespec='seconds'),
+    'python': platform.python_version(),
+    'runs': args.runs,
+    'chat': {'lines': args.lines, 'messages': messages, 'bytes': chatBytes, 'format': args.format, 'people': args.people,
+             'emojiRate': args.emojiRate, 'multilineRate': args.multilineRate, 'seed': args.seed},
+    'stages': stages,
+}
+with open(outputPath, "w") as resultsFile:
+    json.dump(results, resultsFile, indent=2)
+print("Results for {} messages written to {}.".format(messages, outputPath))
+
+if baseline is not None:
+    CompareResults(results, baseline)
@@ -0,0 +1,70 @@
+# Benchmarks how long the command line takes to start, using -X importtime.
+#
+# Usage: python benchmarks/bench_startup.py [--runs N] [--budget MS]
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+rootDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Matches the top level lines of -X importtime: self and cumulative time in microseconds and the module.
+IMPORT_TIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\S+)$")
+
+def ImportTimes(command):
+    """
+    Runs a command under -X importtime from the repository root and
+    returns the wall time in seconds and the cumulative import time in
+    microseconds of each module imported at the top level.
+
+    :param list: command, arguments passed to the interpreter
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime"] + command, cwd=rootDir,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+
+    imports = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match is not None:
+            imports[match.group(3)] = int(match.group(2))
+    return elapsed, imports
+
+parser = argparse.ArgumentParser(description='Benchmarks the start up time of the command line.')
+parser.add_argument('--runs', dest='runs', type=int, default=5, help='number of times each command is run')
+parser.add_argument('--budget', dest='budget', type=float, default=150, help='milliseconds of imports allowed before arguments are checked')
+parser.add_argument('--top', dest='top', type=int, default=5, help='number of the slowest imports to list')
+args = parser.parse_args()
+
+with tempfile.TemporaryDirectory() as tempDir:
+    commands = [
+        ("help", ["whatsapp-poster.py", "--help"]),
+        ("bad input", ["whatsapp-poster.py", "-i", tempDir + "/missing.txt", "-o", tempDir + "/out.pdf", "-t", tempDir]),
+    ]
+
+    # The cost of loading the analysis libraries once the arguments are good, for reference.
+    libraries = ("libraries", ["-c", "import internal.cache, internal.incremental, internal.poster, internal.scheduler"])
+
+    overBudget = False
+    for name, command in commands + [libraries]:
+        # Keep the fastest run of each, the one least disturbed by the rest of the machine.
+        runs = [ImportTimes(command) for _ in range(args.runs)]
+        elapsed, imports = min(runs, key=lambda run: sum(run[1].values()))
+        importTime = sum(imports.values()) / 1000
+
+        status = ""
+        if (name, command) in commands:
+            status = "ok" if importTime <= args.budget else "OVER BUDGET"
+            overBudget = overBudget or importTime > args.budget
+        print("{:10} {:>8.1f} ms imports {:>8.1f} ms wall  {}".format(name, importTime, elapsed * 1000, status))
+
+        slowest = sorted(imports.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        for module, cumulative in slowest:
+            print("    {:40} {:>8.1f} ms".format(module, cumulative / 1000))
+
+print("Budget: {:.0f} ms of imports before the arguments are checked.".format(args.budget))
+sys.exit(1 if overBudget else 0)
@@ -0,0 +1,52 @@
+# Benchmarks per-person word counting for the word use graph.
+#
+# Usage: python benchmarks/bench_word_frequency.py [--words N] [--people N]
+import argparse
+import os
+import sys
+import resource
+import subprocess
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pandas as pd
+from synthetic import GenerateMessageFrame
+from internal.canalysis import CountWordsByPerson
+
+def IterrowsCounts(df):
+    # The original approach: a Python list of (person, word) tuples built with iterrows.
+    df = df.assign(words=df.message.str.strip().str.split(r'[\W_]+', regex=True))
+    rows = list()
+    for row in df[['person', 'words']].iterrows():
+        r = row[1]
+        for word in r.words:
+            rows.append((r.person, word))
+    words = pd.DataFrame(rows, columns=['person', 'word'])
+    words = words[words.word.str.len() > 0]
+    words['word'] = words.word.str.lower()
+    return words.groupby('person').word.value_counts()
+
+METHODS = {"iterrows": IterrowsCounts, "vectorized": CountWordsByPerson}
+
+parser = argparse.ArgumentParser(description='Benchmarks iterrows against vectorized word counting.')
+parser.add_argument('--words', dest='words', type=int, default=5000000, help='number of words in the chat')
+parser.add_argument('--people', dest='people', type=int, default=2, help='number of people in the chat')
+parser.add_argument('--method', dest='method', choices=sorted(METHODS), help='run a single method in this process')
+args = parser.parse_args()
+
+if args.method is None:
+    # Run each method in its own process so peak memory is measured separately.
+    for method in METHODS:
+        subprocess.run([sys.executable, __file__, '--words', str(args.words), '--people', str(args.people),
+                        '--method', method], check=True)
+    sys.exit(0)
+
+df = GenerateMessageFrame(args.words, args.people)
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+METHODS[args.method](df)
+elapsed = time.perf_counter() - start
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+print("{:12} {:>9} messages {:>8.2f}s {:>10.1f} MiB peak over input".format(args.method, df.shape[0], elapsed, (after - before) / 1024))
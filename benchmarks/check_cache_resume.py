@@ -0,0 +1,153 @@
+# Checks that resuming a cached chat gives the same messages and emoji counts as
+# parsing it from scratch. Each generated chat is cached at random points part way
+# through, as if exported early, then loaded again in full from that cache.
+#
+# Usage: python benchmarks/check_cache_resume.py [--lines N] [--cuts N] [--seed N]
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pandas as pd
+
+from synthetic import GenerateChat
+from synthetic import HEADER_LAYOUTS
+from internal.cache import LoadChat
+
+# Ways an export can end its lines and start, as bytes of an LF export.
+ENCODINGS = {
+    'lf': lambda data: data,
+    'crlf-bom': lambda data: b'\xef\xbb\xbf' + data.replace(b'\n', b'\r\n'),
+    'cr': lambda data: data.replace(b'\n', b'\r'),
+}
+
+def quietLoad(inputPath, cachePath):
+    # Returns the chat and what LoadChat printed while loading it.
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        chat = LoadChat(inputPath, cachePath)
+    return chat, output.getvalue()
+
+def emojiCounts(emojiCounter):
+    # Emojis taken back off a resumed day are left with a count of zero.
+    return {date: +dailyMap for date, dailyMap in emojiCounter.dailyMaps.items()}
+
+def CompareChats(chat, expected):
+    """
+    Returns what differs between a loaded chat and the chat parsed from
+    scratch, or None if they are the same.
+
+    :param tuple: chat, message table and emoji counter that were loaded
+    :param tuple: expected, message table and emoji counter parsed from scratch
+    """
+    try:
+        pd.testing.assert_frame_equal(chat[0], expected[0])
+    except AssertionError as error:
+        return "messages differ: " + str(error).splitlines()[0]
+    if emojiCounts(chat[1]) != emojiCounts(expected[1]):
+        return "emoji counts differ"
+    if chat[1].dates != expected[1].dates:
+        return "emoji dates differ"
+    return None
+
+def CutPoints(data, cuts, rand):
+    """
+    Picks byte offsets to cut an export at, never inside a character.
+
+    :param bytes: data, contents of the export
+    :param int: cuts, number of offsets to pick
+    :param Random: rand, random number generator
+    """
+    points = set([len(data) - 1])
+    while len(points) < min(cuts, len(data)):
+        point = rand.randrange(1, len(data))
+        while data[point] & 0xC0 == 0x80:
+            point -= 1
+        points.add(point)
+    return sorted(points)
+
+def CheckResume(tempDir, data, cuts, rand):
+    """
+    Caches the export cut at each point, grows it back to full and checks
+    the resumed chat and its reload from the cache against a fresh parse.
+    Returns the failures and the number of cuts that were resumed.
+
+    :param string: tempDir, directory for the exports and caches
+    :param bytes: data, contents of the full export
+    :param int: cuts, number of cut points to check
+    :param Random: rand, random number generator
+    """
+    inputPath = tempDir + "/chat.txt"
+    cachePath = tempDir + "/messages.npz"
+    with open(inputPath, "wb") as chatFile:
+        chatFile.write(data)
+    expected, _ = quietLoad(inputPath, None)
+
+    failures = []
+    resumed = 0
+    for cut in CutPoints(data, cuts, rand):
+        if os.path.exists(cachePath):
+            os.remove(cachePath)
+        with open(inputPath, "wb") as chatFile:
+            chatFile.write(data[:cut])
+        quietLoad(inputPath, cachePath)
+
+        with open(inputPath, "wb") as chatFile:
+            chatFile.write(data)
+        chat, output = quietLoad(inputPath, cachePath)
+        if "since it was cached" in output:
+            resumed += 1
+        reloaded, _ = quietLoad(inputPath, cachePath)
+
+        for name, loaded in (("resumed", chat), ("reloaded", reloaded)):
+            difference = CompareChats(loaded, expected) if loaded is not None else "could not be loaded"
+            if difference is not None:
+                failures.append("cut at byte {}, {}: {}".format(cut, name, difference))
+
+    # An export changed before the cached part must be parsed again from the start.
+    with open(inputPath, "wb") as chatFile:
+        chatFile.write(data[:len(data) // 2])
+    quietLoad(inputPath, cachePath)
+    changed = data.replace(b'hello', b'HELLO', 1)
+    with open(inputPath, "wb") as chatFile:
+        chatFile.write(changed)
+    chat, output = quietLoad(inputPath, cachePath)
+    if "since it was cached" in output:
+        failures.append("a changed export was resumed")
+    else:
+        with open(inputPath, "wb") as chatFile:
+            chatFile.write(changed)
+        difference = CompareChats(chat, quietLoad(inputPath, None)[0])
+        if difference is not None:
+            failures.append("changed export: " + difference)
+
+    return failures, resumed
+
+parser = argparse.ArgumentParser(description='Checks resumed message caches against parsing from scratch.')
+parser.add_argument('--lines', dest='lines', type=int, default=2000, help='number of lines in each generated chat')
+parser.add_argument('--cuts', dest='cuts', type=int, default=10, help='number of points each chat is cached at')
+parser.add_argument('--seed', dest='seed', type=int, default=0, help='random seed of the chats and cut points')
+args = parser.parse_args()
+
+rand = random.Random(args.seed)
+failed = False
+with tempfile.TemporaryDirectory() as tempDir:
+    for dateFormat in sorted(HEADER_LAYOUTS):
+        GenerateChat(tempDir + "/source.txt", args.lines, dateFormat, args.seed, emojiRate=0.1)
+        with open(tempDir + "/source.txt", "rb") as sourceFile:
+            source = sourceFile.read()
+
+        for encoding, encode in ENCODINGS.items():
+            failures, resumed = CheckResume(tempDir, encode(source), args.cuts, rand)
+            print("{:4} {:9} {:>3} of {} cuts resumed, {}".format(dateFormat, encoding, resumed, args.cuts,
+                                                                 "ok" if not len(failures) else str(len(failures)) + " failed"))
+            for failure in failures:
+                print("    " + failure)
+            failed = failed or len(failures) > 0
+
+sys.exit(1 if failed else 0)
@@ -0,0 +1,106 @@
+# Load all necessary libraries.
+import random
+from datetime import datetime
+from datetime import timedelta
+
+# Header layouts for each supported export date format.
+HEADER_LAYOUTS = {
+    'iso': lambda t: t.strftime("%Y-%m-%d, %H:%M"),
+    'eu': lambda t: t.strftime("%d/%m/%Y, %H:%M"),
+    'us': lambda t: "{}/{}/{}, {}:{} {}".format(t.month, t.day, t.strftime("%y"), t.hour % 12 or 12,
+                                                t.strftime("%M"), t.strftime("%p")),
+    'de': lambda t: t.strftime("%d.%m.%y, %H:%M"),
+}
+
+WORDS = ("hello ok lol haha love you great bad terrible dinner tonight movie sure maybe tomorrow "
+         "work happy sad coffee the and to of it is that for on with this what when").split()
+
+# Emojis used in messages, including skin tones, joined sequences and flags.
+EMOJIS = ["\U0001F602", "\u2764\ufe0f", "\U0001F44D\U0001F3FD", "\U0001F62D", "\U0001F389", "\U0001F525",
+          "\U0001F468\u200d\U0001F469\u200d\U0001F467", "\U0001F1E8\U0001F1E6", "\U0001F60A", "\U0001F64F"]
+
+def chatPeople(people):
+    # Two people keep the names used before the count could be chosen.
+    if people == 2:
+        return ["Alice Smith", "Bob Jones"]
+    return ["Person" + str(i) + " Name" + str(i) for i in range(people)]
+
+def GenerateChat(outputPath, lines, dateFormat='iso', seed=0, people=2, emojiRate=0.0, multilineRate=0.1):
+    """
+    Writes a deterministic synthetic WhatsApp export with the given
+    number of lines.
+
+    :param string: outputPath, path of the flat file to write
+    :param int: lines, number of lines to write
+    :param string: dateFormat, key of HEADER_LAYOUTS to use for headers
+    :param int: seed, random seed
+    :param int: people, number of people in the chat, some much chattier than others
+    :param float: emojiRate, chance of each word being followed by an emoji
+    :param float: multilineRate, chance of a message continuing on another line
+    """
+    rand = random.Random(seed)
+    layout = HEADER_LAYOUTS[dateFormat]
+    persons = chatPeople(people)
+    weights = [1.0 / (rank + 1) for rank in range(people)]
+    timestamp = datetime(2015, 1, 1, 8, 0)
+
+    with open(outputPath, "w", encoding='utf-8') as waFile:
+        written = 0
+        while written < lines:
+            timestamp += timedelta(minutes=rand.randint(1, 180))
+            words = [rand.choice(WORDS) for _ in range(rand.randint(1, 12))]
+            if emojiRate > 0:
+                words = [word + " " + rand.choice(EMOJIS) if rand.random() < emojiRate else word for word in words]
+            person = rand.choice(persons) if people == 2 else rand.choices(persons, weights)[0]
+            waFile.write(layout(timestamp) + " - " + person + ": " + " ".join(words) + "\n")
+            written += 1
+
+            # Some messages span multiple lines.
+            if rand.random() < multilineRate and written < lines:
+                waFile.write("and - " + rand.choice(WORDS) + "\n")
+                written += 1
+
+def GenerateMessageFrame(words, people=2, vocabulary=20000, seed=0):
+    """
+    Builds a deterministic DataFrame of person and message columns as
+    loaded from a textual CSV, holding roughly the given number of words.
+    Word use follows a Zipf-like distribution over the vocabulary.
+
+    :param int: words, total number of words across all messages
+    :param int: people, number of people in the chat
+    :param int: vocabulary, number of distinct words
+    :param int: seed, random seed
+    """
+    import pandas as pd
+    from itertools import accumulate
+
+    rand = random.Random(seed)
+    vocab = WORDS + ["word" + str(i) for i in range(vocabulary - len(WORDS))]
+    weights = list(accumulate(1.0 / (rank + 1) for rank in range(len(vocab))))
+    persons = ["Person " + str(i) for i in range(people)]
+
+    personColumn = []
+    messageColumn = []
+    written = 0
+    while written < words:
+        length = rand.randint(1, 12)
+        personColumn.append(rand.choice(persons))
+        messageColumn.append(" ".join(rand.choices(vocab, cum_weights=weights, k=length)))
+        written += length
+
+    return pd.DataFrame({'person': personColumn, 'message': messageColumn})
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Writes a deterministic synthetic WhatsApp export.')
+    parser.add_argument('-o', '--output', dest='output', required=True, help='path of the flat file to write')
+    parser.add_argument('--lines', dest='lines', type=int, default=100000, help='number of lines to write')
+    parser.add_argument('--format', dest='format', default='iso', choices=sorted(HEADER_LAYOUTS), help='date format of the headers')
+    parser.add_argument('--people', dest='people', type=int, default=2, help='number of people in the chat')
+    parser.add_argument('--emoji-rate', dest='emojiRate', type=float, default=0.0, help='chance of each word being followed by an emoji')
+    parser.add_argument('--multiline-rate', dest='multilineRate', type=float, default=0.1, help='chance of a message continuing on another line')
+    parser.add_argument('--seed', dest='seed', type=int, default=0, help='random seed')
+    args = parser.parse_args()
+
+    GenerateChat(args.output, args.lines, args.format, args.seed, args.people, args.emojiRate, args.multilineRate)
@@ -0,0 +1,273 @@
+# Load all necessary libraries.
+import os
+import re
+import hashlib
+import numpy as np
+import pandas as pd
+from collections import Counter
+from itertools import islice
+
+from internal.headers import SAMPLE_LINES
+from internal.headers import DetectHeaderFormat
+from internal.emojis import FindEmojis
+from internal.converter import PARSER_VERSION
+from internal.converter import MESSAGE_COLUMNS
+from internal.converter import ChatParser
+from internal.converter import ParseChat
+from internal.converter import CreateMessageFrame
+from internal.converter import MessageFrameBuilder
+from internal.converter import EmojiByDateCounter
+from internal.profiler import Profile
+
+# Bumped whenever the layout of the cache changes.
+CACHE_VERSION = 2
+
+# The size of each block read when hashing the flat file.
+HASH_BLOCK_SIZE = 1 << 20
+
+# Every minute of the day, indexed by minutes since midnight.
+TIME_STRINGS = np.array(["{:02d}:{:02d}".format(minute // 60, minute % 60) for minute in range(24 * 60)])
+
+def packStrings(strings):
+    # Store strings as one UTF-8 buffer and the character offset of each string in it.
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    np.cumsum([len(string) for string in strings], out=offsets[1:])
+    return np.frombuffer("".join(strings).encode('utf-8'), dtype=np.uint8), offsets
+
+def unpackStrings(buffer, offsets):
+    text = buffer.tobytes().decode('utf-8')
+    offsets = offsets.tolist()
+    return [text[start:end] for start, end in zip(offsets, offsets[1:])]
+
+def hashFile(inputPath, prefixLength):
+    """
+    Hashes a flat file, also returning the hash of its first bytes so a
+    cached export can be recognised as the start of a newer one. Returns
+    the prefix hash, the full hash and the length of the file.
+
+    :param string: inputPath, path of the flat file
+    :param int: prefixLength, number of bytes in the prefix
+    """
+    hasher = hashlib.sha256()
+    length = 0
+    prefixHash = None
+    with open(inputPath, "rb") as inputFile:
+        while True:
+            if length == prefixLength:
+                prefixHash = hasher.hexdigest()
+
+            # Stop exactly at the end of the prefix so its hash can be taken.
+            blockSize = prefixLength - length if length < prefixLength else HASH_BLOCK_SIZE
+            block = inputFile.read(min(blockSize, HASH_BLOCK_SIZE))
+            if not len(block):
+                break
+
+            hasher.update(block)
+            length += len(block)
+
+    return prefixHash, hasher.hexdigest(), length
+
+def headerPattern(headerFormat):
+    return "" if headerFormat is None else headerFormat.pattern
+
+def readCache(cachePath):
+    # Load every array, or nothing if the cache is missing or from another version.
+    try:
+        with np.load(cachePath, allow_pickle=False) as cache:
+            arrays = {name: cache[name] for name in cache.files}
+    except (IOError, OSError, ValueError):
+        return None
+
+    if 'versions' not in arrays or arrays['versions'].tolist() != [CACHE_VERSION, PARSER_VERSION]:
+        return None
+    return arrays
+
+def unpackMessages(cache, rows):
+    messages = unpackStrings(cache['messageBuffer'], cache['messageOffsets'][:rows + 1])
+    columns = {
+        'index': cache['index'][:rows],
+        'person': cache['personNames'][cache['personCodes'][:rows]],
+        'date': np.datetime_as_string(cache['date'][:rows], unit='D'),
+        'time': TIME_STRINGS[cache['time'][:rows]],
+        'timestamp': cache['date'][:rows] + cache['time'][:rows].astype('timedelta64[m]'),
+        'message': [None if missing else message for message, missing in zip(messages, cache['messageMissing'][:rows].tolist())],
+    }
+    for column in MESSAGE_COLUMNS[5:]:
+        columns[column] = cache[column][:rows]
+
+    return CreateMessageFrame(columns)
+
+def unpackEmojis(cache):
+    emojiCounter = EmojiByDateCounter()
+    emojiKeys = unpackStrings(cache['emojiBuffer'], cache['emojiKeyOffsets'])
+    emojiCounts = cache['emojiCounts'].tolist()
+    emojiOffsets = cache['emojiOffsets'].tolist()
+    for i, date in enumerate(np.datetime_as_string(cache['emojiDates'], unit='D')):
+        start, end = emojiOffsets[i], emojiOffsets[i + 1]
+        emojiCounter.dailyMaps[str(date)] = Counter(dict(zip(emojiKeys[start:end], emojiCounts[start:end])))
+
+    # Index the days so range snapshots can total the emojis up to each one.
+    emojiCounter.close()
+    return emojiCounter
+
+def SaveMessageCache(cachePath, sourceHash, sourceLength, parser, df, emojiCounter):
+    """
+    Saves the message table and the daily emoji counts of a chat as
+    typed columns in an uncompressed NumPy archive. The person column
+    is stored as category codes, dates as days and times as minutes.
+    Where the last message started is saved too, so a longer export of
+    the same chat only has to be parsed from there.
+
+    :param string: cachePath, path of the cache file to write
+    :param string: sourceHash, hash of the flat file the chat came from
+    :param int: sourceLength, length in bytes of the flat file
+    :param ChatParser: parser, parser the chat was read with
+    :param DataFrame: df, message table from the converter
+    :param EmojiByDateCounter: emojiCounter, daily emoji counts of the chat
+    """
+    person = df['person'].astype('category')
+    messages = df['message']
+    messageBuffer, messageOffsets = packStrings(messages.fillna("").tolist())
+
+    emojiDates = sorted(emojiCounter.dailyMaps)
+    emojiKeys = []
+    emojiCounts = []
+    emojiOffsets = [0]
+    for date in emojiDates:
+        emojiKeys.extend(emojiCounter.dailyMaps[date].keys())
+        emojiCounts.extend(emojiCounter.dailyMaps[date].values())
+        emojiOffsets.append(len(emojiKeys))
+    emojiBuffer, emojiKeyOffsets = packStrings(emojiKeys)
+
+    # The last message may still grow, so it is parsed again when resuming.
+    # It is only in the table if it was a text message.
+    lastMessage = parser.lastMessage
+    if lastMessage is None:
+        resume = [-1, 0, 0]
+        resumeEmojis = Counter()
+        resumeDate = ""
+    else:
+        rows = df.shape[0]
+        if rows and df.index[-1] == lastMessage.index:
+            rows -= 1
+        resume = [parser.lastOffset, lastMessage.index, rows]
+        resumeEmojis = Counter(FindEmojis(lastMessage.message))
+        resumeDate = lastMessage.date
+    resumeBuffer, resumeKeyOffsets = packStrings(list(resumeEmojis.keys()))
+
+    columns = {
+        'versions': np.array([CACHE_VERSION, PARSER_VERSION], dtype=np.int64),
+        'sourceHash': np.array(sourceHash),
+        'sourceLength': np.array(sourceLength, dtype=np.int64),
+        'headerPattern': np.array(headerPattern(parser.headerFormat)),
+        'resume': np.array(resume, dtype=np.int64),
+        'resumeDate': np.array(resumeDate),
+        'resumeEmojiBuffer': resumeBuffer,
+        'resumeEmojiKeyOffsets': resumeKeyOffsets,
+        'resumeEmojiCounts': np.array(list(resumeEmojis.values()), dtype=np.int64),
+        'index': df.index.values.astype(np.int64),
+        'personCodes': person.cat.codes.values.astype(np.int32),
+        'personNames': np.array(list(person.cat.categories), dtype=str),
+        'date': df['day'].values.astype('datetime64[D]'),
+        'time': (df['hour'].values.astype(np.int16) * 60 + df['timestamp'].dt.minute.values).astype(np.int16),
+        'messageBuffer': messageBuffer,
+        'messageOffsets': messageOffsets,
+        'messageMissing': messages.isna().values,
+        'emojiDates': np.array(emojiDates, dtype='datetime64[D]'),
+        'emojiOffsets': np.array(emojiOffsets, dtype=np.int64),
+        'emojiBuffer': emojiBuffer,
+        'emojiKeyOffsets': emojiKeyOffsets,
+        'emojiCounts': np.array(emojiCounts, dtype=np.int64),
+    }
+    for column in MESSAGE_COLUMNS[5:]:
+        columns[column] = df[column].values.astype(np.int8)
+
+    try:
+        # Write to a temporary file first so a failed write never leaves a partial cache.
+        with open(cachePath + ".tmp", "wb") as cacheFile:
+            np.savez(cacheFile, **columns)
+        os.replace(cachePath + ".tmp", cachePath)
+    except (IOError, OSError):
+        print("Could not write message cache " + cachePath + "! The chat will be read again next time.")
+        return False
+
+    return True
+
+def LoadChat(inputPath, cachePath=None, jobs=1):
+    """
+    Reads a flat WhatsApp file into the message table and its daily
+    emoji counts. With a cache path, the parsed messages are saved under
+    the hash of the file and the parser version. An unchanged file is
+    then loaded straight from the cache, and a file that was only
+    appended to only has its new messages parsed and scored. Returns
+    None if the file could not be read.
+
+    :param string: inputPath, path of input flat file
+    :param string: cachePath, path of the cache file, or None to not cache
+    :param int: jobs, number of processes used to score sentiment
+    """
+    with Profile("Read cache"):
+        cache = readCache(cachePath) if cachePath is not None else None
+    prefixLength = int(cache['sourceLength']) if cache is not None else 0
+    try:
+        with Profile("Hash file"):
+            prefixHash, sourceHash, sourceLength = hashFile(inputPath, prefixLength)
+    except (IOError, OSError):
+        print("Could not open file "+inputPath+"! Please select a proper file for reading.")
+        return None
+
+    if cache is not None and prefixHash != str(cache['sourceHash']):
+        cache = None
+
+    if cache is not None and sourceLength == prefixLength:
+        print("Loaded file " + inputPath + " from " + cachePath + "...")
+        with Profile("Unpack cache"):
+            return unpackMessages(cache, cache['index'].shape[0]), unpackEmojis(cache)
+
+    # Only resume if the start of the file still reads as the same header format.
+    resumeOffset, resumeIndex, resumeRows = cache['resume'].tolist() if cache is not None else (-1, 0, 0)
+    if resumeOffset >= 0:
+        with open(inputPath, "r", encoding='utf-8-sig') as waFile:
+            if headerPattern(DetectHeaderFormat(list(islice(waFile, SAMPLE_LINES)))) != str(cache['headerPattern']):
+                resumeOffset = -1
+
+    builder = MessageFrameBuilder(jobs)
+    emojiCounter = EmojiByDateCounter()
+    if resumeOffset < 0:
+        print("Converting file " + inputPath + "...")
+        parser = ChatParser()
+        with Profile("Parse chat"):
+            if not ParseChat(inputPath, [builder, emojiCounter], parser):
+                return None
+        df = builder.df
+    else:
+        print("Converting messages added to " + inputPath + " since it was cached...")
+        pattern = str(cache['headerPattern'])
+        parser = ChatParser(re.compile(pattern) if len(pattern) else None, resumeOffset, resumeIndex - 1, False)
+        with Profile("Parse chat", resumed=True):
+            if not ParseChat(inputPath, [builder, emojiCounter], parser):
+                return None
+
+        # The last cached message is replaced by its parse from the newer file.
+        df = unpackMessages(cache, resumeRows)
+        if builder.df.shape[0]:
+            df = pd.concat([df, builder.df])
+            df['person'] = df['person'].astype(object).astype('category')
+
+        cachedCounter = unpackEmojis(cache)
+        resumeMap = cachedCounter.dailyMaps[str(cache['resumeDate'])]
+        resumeEmojis = unpackStrings(cache['resumeEmojiBuffer'], cache['resumeEmojiKeyOffsets'])
+        for emojiItem, count in zip(resumeEmojis, cache['resumeEmojiCounts'].tolist()):
+            resumeMap[emojiItem] -= count
+            if resumeMap[emojiItem] <= 0:
+                del resumeMap[emojiItem]
+
+        for date, dailyMap in emojiCounter.dailyMaps.items():
+            cachedCounter.dailyMaps.setdefault(date, Counter()).update(dailyMap)
+        emojiCounter = cachedCounter
+    emojiCounter.close()
+
+    if cachePath is not None:
+        with Profile("Save cache"):
+            SaveMessageCache(cachePath, sourceHash, sourceLength, parser, df, emojiCounter)
+    return df, emojiCounter
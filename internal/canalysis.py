@@ -1,10 +1,33 @@
 # Load all necessary libraries.
 import pandas as pd
+import numpy as np
 
-from textblob import TextBlob 
 import re 
+from functools import lru_cache
 
-import matplotlib.pyplot as plt
+from internal.figures import GetFigure
+
+# The maximum number of distinct cleaned messages with a cached sentiment.
+SENTIMENT_CACHE_SIZE = 200000
+
+# Bar and edge colours for each person in the word use graph.
+WORD_USE_COLOURS = [('#ef3b2c', '#67000d'), ('#807dba', '#3f007d'), ('#41ab5d', '#00441b'),
+                    ('#fd8d3c', '#7f2704'), ('#4292c6', '#08306b'), ('#f768a1', '#7a0177')]
+
+# The most people drawn on a poster, one for each colour of the word use graph.
+MAX_PARTICIPANTS = len(WORD_USE_COLOURS)
+
+# The name everyone else in a larger group is drawn under.
+OTHERS_NAME = "Others"
+
+# Day numbers start on a Thursday, so adding this makes Monday day zero of the week.
+WEEKDAY_OFFSET = 3
+
+# The days of the week, in the order of the rows of the weekday by hour counts.
+WEEKDAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Mentions and links, which CleanMessage also removes, are not counted as words.
+MENTION_LINK_PATTERN = r"(@[A-Za-z0-9]+)|(\w+:\/\/\S+)"
 
 def CleanMessage(message): 
     return ' '.join(re.sub("(@[A-Za-z0-9]+)|([^0-9A-Za-z \t]) |(\w+:\/\/\S+)", " ", message).replace("\\n", " ").replace("\\t", "").split()) 
@@ -29,23 +52,103 @@ def LoadCommonWords():
     return wordList
 
 
-def GetMessageSentiment(message):
-    # Create TextBlob object of passed message
-    message = CleanMessage(message)
-    analysis = TextBlob(message) 
+@lru_cache(maxsize=SENTIMENT_CACHE_SIZE)
+def scoreCleanedMessage(message):
+    from textblob import TextBlob
+
+    # Create TextBlob object of the cleaned message.
+    analysis = TextBlob(message)
     return analysis.sentiment.polarity
 
+def GetMessageSentiment(message):
+    return scoreCleanedMessage(CleanMessage(message))
+
+def ScoreMessageSentiments(messages):
+    """
+    Scores a batch of messages and returns the good, neutral and bad
+    sentiment columns for them. Each distinct cleaned message is only
+    scored once, and scores are cached across batches.
+
+    :param list: messages, messages to score
+    """
+    cleaned = [CleanMessage(message) for message in messages]
+    scores = {}
+    for message in cleaned:
+        if message not in scores:
+            scores[message] = scoreCleanedMessage(message)
+
+    goodSentiment = [1 if scores[message] > 0 else 0 for message in cleaned]
+    badSentiment = [1 if scores[message] < 0 else 0 for message in cleaned]
+    neutralSentiment = [1 if scores[message] == 0 else 0 for message in cleaned]
+    return goodSentiment, neutralSentiment, badSentiment
+
+def CountMessagesByHour(df):
+    """
+    Counts the messages sent in each hour of the day.
+
+    :param DataFrame: df, messages to count
+    """
+    return np.bincount(df.hour[df.message.notna()].values, minlength=24).tolist()
+
+def CountMessagesByWeekdayHour(df):
+    """
+    Counts the messages sent in each hour of each day of the week in a
+    single pass. Returns an array with a row for each day, Monday first,
+    and a column for each hour. Counts of consecutive blocks of
+    messages can be added together.
+
+    :param DataFrame: df, messages to count
+    """
+    sent = df.message.notna().values
+    weekdays = (df.day.values[sent].astype(np.int64) + WEEKDAY_OFFSET) % 7
+    return np.bincount(weekdays * 24 + df.hour.values[sent], minlength=7 * 24).reshape(7, 24)
+
+def WriteTextingFrequency(weekdayHourCounts, outputDirectory):
+    """
+    Writes the messages sent in each hour of each day of the week as a
+    CSV file next to the texting frequency graph, a row for each day.
+
+    :param array: weekdayHourCounts, counts from CountMessagesByWeekdayHour
+    :param string: outputDirectory, directory to write TextFrequency.csv to
+    """
+    try:
+        waOut = open(outputDirectory + "/TextFrequency.csv", "w", encoding='utf-8')
+    except IOError:
+        print("Could not open output file " + outputDirectory + "/TextFrequency.csv for writing!")
+        return False
+
+    rows = ["weekday," + ",".join(str(hour) for hour in range(24)) + "\n"]
+    for weekday, counts in zip(WEEKDAY_NAMES, weekdayHourCounts.tolist()):
+        rows.append(weekday + "," + ",".join(str(count) for count in counts) + "\n")
+    waOut.write("".join(rows))
+    waOut.close()
+    return True
+
 def GenerateTextingFrequency(df, outputDirectory):
-    df.time = pd.to_datetime(df.time)
-    mFreq = df.set_index('time').groupby([pd.Grouper(freq='60Min')]).count()
+    return RenderTextingFrequency(CountMessagesByHour(df), outputDirectory)
+
+def RenderTextingFrequency(hourCounts, outputDirectory):
+    # Build an hourly series spanning the first to the last hour with messages.
+    activeHours = [hour for hour in range(24) if hourCounts[hour] > 0]
+
+    # Check if there's nothing to output.
+    if not len(activeHours):
+        fig = GetFigure('TextFrequency', (30, 5), frameon=False)
+        fig.suptitle('No Messages in Current Date Range', fontsize=30, fontweight='bold', color='w', y=0.5)
+        fig.savefig(outputDirectory+"/TextFrequency.png", transparent=True)
+        return True
+
+    hours = list(range(activeHours[0], activeHours[-1] + 1))
+    index = pd.date_range(pd.Timestamp.today().normalize() + pd.Timedelta(hours=hours[0]), periods=len(hours), freq='60min', name='time')
+    mFreq = pd.Series([hourCounts[hour] for hour in hours], index=index, name='message')
 
     # Create the plot.
-    plt.figure(figsize=(30,5), frameon=False)
-    plt.box(on=False)
-    mFreq.sort_values(by="time", ascending=[False])["message"].plot.line(linewidth="7.0", color='#ef3b2c')
+    fig = GetFigure('TextFrequency', (30, 5), frameon=False)
+    ax = fig.add_subplot()
+    ax.set_frame_on(False)
+    mFreq.sort_index(ascending=False).plot.line(ax=ax, linewidth="7.0", color='#ef3b2c')
 
     # Remove the tick markers.
-    ax = plt.gca()
     ax.tick_params(axis='both', length=0)
     ax.set_xlabel('')
     ax.set_ylabel('')
@@ -68,7 +171,7 @@ def GenerateTextingFrequency(df, outputDirectory):
     for tick in yticks:
         curTick += 1
         if curTick + 3 == len(yticks):
-            plt.axhline(y=int(ylabels[curTick]), color='w', linestyle='-', linewidth=3, visible=True)
+            ax.axhline(y=int(ylabels[curTick]), color='w', linestyle='-', linewidth=3, visible=True)
             tick.label1.set_visible(True)
             tick.label1.set_color('white')
             tick.label1.set_fontsize(30)
@@ -76,17 +179,32 @@ def GenerateTextingFrequency(df, outputDirectory):
         tick.label1.set_visible(False)
 
     # Output the diagram.
-    plt.tight_layout(pad=0)
-    plt.savefig(outputDirectory+"/TextFrequency.png", transparent=True)
-    plt.close()
+    fig.tight_layout(pad=0)
+    fig.savefig(outputDirectory+"/TextFrequency.png", transparent=True)
     return True
 
+def CountSentiment(df):
+    """
+    Totals the good, neutral and bad sentiment of the messages.
+
+    :param DataFrame: df, messages to total
+    """
+    return int(df['goodSentiment'].sum()), int(df['neutralSentiment'].sum()), int(df['badSentiment'].sum())
+
 def GenerateMessageSentimateProportion(df, outputDirectory):
-    goodSentiment = df['goodSentiment'].sum()
-    badSentiment = df['badSentiment'].sum()
-    neutralSentiment = df['neutralSentiment'].sum()
+    goodSentiment, neutralSentiment, badSentiment = CountSentiment(df)
+    return RenderMessageSentimateProportion(goodSentiment, neutralSentiment, badSentiment, outputDirectory)
+
+def RenderMessageSentimateProportion(goodSentiment, neutralSentiment, badSentiment, outputDirectory):
     total = goodSentiment + badSentiment + neutralSentiment
 
+    # Check if there's nothing to output.
+    if total == 0:
+        fig = GetFigure('SentimentProportions')
+        fig.suptitle('No Messages in Current Date Range', fontsize=14, fontweight='bold', color='w', y=0.5)
+        fig.savefig(outputDirectory+"/SentimentProportions.png", transparent=True)
+        return True
+
     # Get percentages.
     goodPercentage = "{:.2f}".format((goodSentiment / total) * 100)
     badPercentage = "{:.2f}".format(badSentiment / total * 100)
@@ -100,8 +218,8 @@ def GenerateMessageSentimateProportion(df, outputDirectory):
     colours=['#238b45', '#e31a1c', '#ffffb3']
 
     # Create the initial pie chart.
-    plt.figure(figsize=(20,20), frameon=False)
-    ax = sentimentDF.plot.pie(y='sentiment', colors=colours, fontsize=0, wedgeprops={"edgecolor":"k", 'linewidth': 1.25, 'linestyle': 'solid', 'antialiased': True})
+    fig = GetFigure('SentimentProportions')
+    ax = sentimentDF.plot.pie(ax=fig.add_subplot(), y='sentiment', colors=colours, fontsize=0, wedgeprops={"edgecolor":"k", 'linewidth': 1.25, 'linestyle': 'solid', 'antialiased': True})
 
     # Configure the legend.
     patches, labels = ax.get_legend_handles_labels()
@@ -109,92 +227,110 @@ def GenerateMessageSentimateProportion(df, outputDirectory):
     ax.set_ylabel('')
 
     # Create a donut.
-    plt.setp(ax.patches, width=0.25)
+    for patch in ax.patches:
+        patch.set_width(0.25)
     ax.set_aspect("equal")
 
     # Output the diagram.
-    plt.tight_layout(pad=0)
-    plt.savefig(outputDirectory+"/SentimentProportions.png", transparent=True)
-    plt.close()
+    fig.tight_layout(pad=0)
+    fig.savefig(outputDirectory+"/SentimentProportions.png", transparent=True)
     return True
 
-def GenerateWordUseFrequency(df, outputDirectory):
-    commonWords = LoadCommonWords()
-
-    # First, tokenize by line.
-    df['words'] = df.message.str.strip().str.split('[\W_]+')
-
-    # Now create a new data frame with persons and words.
-    rows = list()
-    for row in df[['person', 'words']].iterrows():
-        r = row[1]
-        for word in r.words:
-            rows.append((r.person, word))
-    words = pd.DataFrame(rows, columns=['person', 'word'])
+def CountWordsByPerson(df):
+    """
+    Counts how often each person uses each word. Returns a table with a
+    row per word and a column per person. Every message is only
+    tokenized once and the table feeds both the word use graph and the
+    word clouds.
+
+    :param DataFrame: df, messages to count
+    """
+    # Escaped line breaks are kept in the message text, so split them out first.
+    messages = df.message.fillna("").str.replace("\\n", " ", regex=False).str.replace("\\t", " ", regex=False)
+    messages = messages.str.replace(MENTION_LINK_PATTERN, " ", regex=True)
+    words = pd.DataFrame({'person': df.person.astype(object).values,
+                          'word': messages.str.strip().str.lower().str.split(r'[\W_]+', regex=True).values})
+
+    # One row per word, then count the words per person.
+    words = words.explode('word')
     words = words[words.word.str.len() > 0]
-    words['word'] = words.word.str.lower()
+    return words.groupby('person').word.value_counts().unstack(level='person', fill_value=0)
+
+def SelectParticipants(wordCounts, persons, limit=MAX_PARTICIPANTS):
+    """
+    Picks the people drawn on a poster from the word count table. Chats
+    with up to limit people keep everyone, in the order they joined.
+    Larger groups keep the people using the most words and add everyone
+    else together under one Others column, so the charts of a poster
+    cost the same however large the group is. Returns the names and the
+    word count table with a column for each.
+
+    :param DataFrame: wordCounts, table with a row per word and a column per person
+    :param list: persons, everyone in the chat in the order they joined
+    :param int: limit, the most people drawn, including Others
+    """
+    if len(persons) <= limit:
+        return list(persons), wordCounts
+
+    # Ties keep the order people joined in.
+    totals = wordCounts.sum(axis=0).reindex(persons, fill_value=0)
+    top = list(totals.sort_values(ascending=False, kind='stable').index[:limit - 1])
+
+    topColumns = wordCounts.columns.isin(top)
+    bucketed = wordCounts.loc[:, topColumns].reindex(columns=top, fill_value=0)
+    bucketed[OTHERS_NAME] = wordCounts.loc[:, ~topColumns].sum(axis=1)
+    return top + [OTHERS_NAME], bucketed
 
-    # Now count the words per person.
-    counts = words.groupby('person') \
-        .word.value_counts() \
-        .to_frame() \
-        .rename(columns={'word': 'count'})
+def GenerateWordUseFrequency(df, outputDirectory):
+    return RenderWordUseFrequency(CountWordsByPerson(df), outputDirectory)
+
+def RenderWordUseFrequency(wordCounts, outputDirectory):
+    commonWords = pd.Index(LoadCommonWords())
 
     # Remove the counts for common words. Get a total count.
-    counts = counts.drop(index=commonWords, level=1)
-    totalCount = counts.groupby(level=1).sum().nlargest(15, columns='count')
-
-    # Generate the person data.
-    names = []
-    data = []
-
-    # Generate data for our words.
-    topWords = list(totalCount.index.values)
-    for person in counts.groupby('person'):
-        names.append(person[0])
-        curData = list()
-
-        pD = person[1].reset_index(level=0, drop=True)
-        for top in topWords:
-            try:
-                item = pD.loc[top]
-                curData.append(item['count'])
-            except KeyError:
-                curData.append(0)
-
-        data.append(curData)
-
-    # Get the max count for both datasets.
-    xmax = 0
-    dataOne = max(data[0])
-    dataTwo = max(data[1])
-    if dataOne > dataTwo:
-        xmax = dataOne
-    else:
-        xmax = dataTwo
+    counts = wordCounts[~wordCounts.index.isin(commonWords)]
+    totalCount = counts.sum(axis=1).sort_index().sort_values(ascending=False, kind='stable')
 
-    # Reverse all the lists.
+    # Generate data for our words, most used at the top.
+    topWords = list(totalCount.index[0:15])
     topWords.reverse()
-    data[0].reverse()
-    data[1].reverse()
+
+    # Check if there's nothing to output, like a snapshot of only emojis.
+    if not len(topWords):
+        fig = GetFigure('WordFrequency')
+        fig.suptitle('No Words in Current Date Range', fontsize=18, fontweight='bold', color='w', y=0.5)
+        fig.savefig(outputDirectory + "/WordFrequency.png", transparent=True)
+        return True
+
+    names = sorted(name for name in counts.columns if name != OTHERS_NAME)
+    names += [name for name in counts.columns if name == OTHERS_NAME]
+    data = [[int(count) for count in counts.loc[topWords, name]] for name in names]
+
+    # Get the max count across all datasets.
+    xmax = max([max(personData, default=0) for personData in data] + [1])
 
     # Generate the figure.
-    plt.figure(figsize=(50, 50), frameon=False)
-    fig, axes = plt.subplots(ncols=2, sharey=True)
-    axes[0].barh(topWords, data[0], align='center', color='#ef3b2c', edgecolor='#67000d', zorder=10)
-    axes[1].barh(topWords, data[1], align='center', color='#807dba', edgecolor='#3f007d', zorder=10)
-
-    # Set title for names.
-    axes[0].set_title(names[0].split(' ')[0], fontsize=18, color='w')
-    axes[1].set_title(names[1].split(' ')[0], fontsize=18, color='w')
-
-    # Configure the pyramid.
-    axes[0].invert_xaxis()
-    axes[0].set(yticks=topWords, yticklabels=[])
-    for yloc in topWords:
-        axes[0].annotate(yloc, (0.5, yloc), xycoords=('figure fraction', 'data'),
-                         ha='center', va='center', color='w', fontsize=18)
-    axes[0].yaxis.tick_right()
+    fig = GetFigure('WordFrequency')
+    axes = fig.subplots(ncols=len(names), sharey=True, squeeze=False)[0]
+    for i in range(len(names)):
+        colour, edgeColour = WORD_USE_COLOURS[i % len(WORD_USE_COLOURS)]
+        axes[i].barh(topWords, data[i], align='center', color=colour, edgecolor=edgeColour, zorder=10)
+
+        # Set title for names.
+        axes[i].set_title(names[i].split(' ')[0], fontsize=18, color='w')
+
+    if len(names) == 2:
+        # Configure the pyramid.
+        axes[0].invert_xaxis()
+        axes[0].set(yticks=topWords, yticklabels=[])
+        for yloc in topWords:
+            axes[0].annotate(yloc, (0.5, yloc), xycoords=('figure fraction', 'data'),
+                             ha='center', va='center', color='w', fontsize=18)
+        axes[0].yaxis.tick_right()
+    else:
+        # Label the words to the left of the first person.
+        axes[0].set_yticks(range(len(topWords)))
+        axes[0].set_yticklabels(topWords, fontsize=18, color='w')
 
     # Remove all spines.
     for ax in axes:
@@ -218,18 +354,17 @@ def GenerateWordUseFrequency(df, outputDirectory):
                 label.set_visible(False)
             count += 1
 
-    # Set the distance between the two plots.
+    # Set the distance between the plots.
     # TODO: This is a bad hard-coded operation. Change in the future!
     wspace = 0.45
     fig.subplots_adjust(wspace=wspace)
 
     # Fix the plot xlimits.
     for ax in axes:
-        plt.setp(ax, xlim=xmax)
+        ax.set_xlim(xmax)
 
     # Output the final figure.
-    plt.tight_layout(pad=0)
-    plt.xlim(0, xmax)
-    plt.savefig(outputDirectory + "/WordFrequency.png", transparent=True)
-    plt.close()
+    fig.tight_layout(pad=0)
+    axes[-1].set_xlim(0, xmax)
+    fig.savefig(outputDirectory + "/WordFrequency.png", transparent=True)
     return True
\ No newline at end of file
@@ -1,17 +1,26 @@
 # Load all necessary libraries.
-import sys
-import argparse
 import re
+import mmap
+import codecs
+from collections import Counter
+from collections import deque
+from collections import namedtuple
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from datetime import timedelta
 from dateutil.parser import parse
+import numpy as np
+import pandas as pd
 
-from internal.canalysis import GetMessageSentiment
-from internal.canalysis import CleanMessage
+from internal.headers import SAMPLE_LINES
+from internal.headers import DetectHeaderFormat
+from internal.headers import HeaderSplitter
+from internal.headers import MatchHeader
 
-from emoji import UNICODE_EMOJI
+from internal.canalysis import ScoreMessageSentiments
 
-def isEmoji(s):
-    return s in UNICODE_EMOJI
+from internal.emojis import FindEmojis
 
 def isDate(string, fuzzy=False):
     """
@@ -27,221 +36,561 @@ def isDate(string, fuzzy=False):
     except ValueError:
         return False
 
+def sanitizeMessage(inputString):
+    """
+    Remove all emojis and escapes line breaks and tabs in an input string.
+
+    :param string: inputString, string to convert
+    """
+    return inputString.encode('ascii', 'ignore').decode('ascii').replace("\n",r"\n").replace("\t",r"\t")
+
 def sanitizeStringForCSV(inputString):
     """
     Remove all emojis and escapes certain characters from an input string.
 
     :param string: inputString, string to convert
     """
-    return "\""+inputString.encode('ascii', 'ignore').decode('ascii').replace("\n",r"\n").replace("\t",r"\t").replace("\"","\"\"")+"\""
+    return "\""+sanitizeMessage(inputString).replace("\"","\"\"")+"\""
+
+# The number of messages scored and written together.
+BATCH_SIZE = 5000
+
+# The columns of the message table, in order. The first is the index.
+MESSAGE_COLUMNS = ['index', 'person', 'date', 'time', 'message', 'goodSentiment', 'neutralSentiment', 'badSentiment']
 
-def ConvertToTextualCSV(inputPath, outputPath):
+# Bumped whenever a change to parsing or scoring changes the message table.
+PARSER_VERSION = 2
+
+# A single message parsed out of a flat WhatsApp file.
+ChatMessage = namedtuple('ChatMessage', ['index', 'person', 'date', 'time', 'message'])
+
+# The size of each block of a mapped file decoded at once.
+SCAN_BLOCK_SIZE = 1 << 20
+
+# Matches each line of a mapped file along with its line ending.
+LINE_REGEX = re.compile(rb'[^\r\n]*(?:\r\n|\r|\n)|[^\r\n]+')
+
+def mapFile(rawFile):
+    # Map the file so it is read straight from the page cache instead of copied.
+    try:
+        buffer = mmap.mmap(rawFile.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, OSError):
+        # Empty files and pipes cannot be mapped.
+        return rawFile.read()
+
+    if hasattr(buffer, 'madvise'):
+        buffer.madvise(mmap.MADV_SEQUENTIAL)
+    return buffer
+
+def byteLength(string):
+    return len(string) if string.isascii() else len(string.encode('utf-8'))
+
+def mappedLines(buffer, offset):
+    # Split the lines at the same endings as reading the file with newline=''.
+    for match in LINE_REGEX.finditer(buffer, offset):
+        yield match.group().decode('utf-8')
+
+def mappedBlocks(buffer, offset):
+    # End each block after a line feed so no line or character is cut in two.
+    released = 0
+    while offset < len(buffer):
+        end = len(buffer)
+        if offset + SCAN_BLOCK_SIZE < end:
+            lineEnd = buffer.rfind(b'\n', offset, offset + SCAN_BLOCK_SIZE)
+            if lineEnd < 0:
+                lineEnd = buffer.find(b'\n', offset + SCAN_BLOCK_SIZE)
+            if lineEnd >= 0:
+                end = lineEnd + 1
+
+        yield offset, buffer[offset:end].decode('utf-8')
+        offset = end
+
+        # Unmap the pages already decoded. They stay in the page cache for the next run.
+        if hasattr(buffer, 'madvise'):
+            decoded = offset - offset % mmap.PAGESIZE
+            if decoded > released:
+                buffer.madvise(mmap.MADV_DONTNEED, released, decoded - released)
+                released = decoded
+
+class ChatParser:
     """
-    Converts a Flat WhatsApp file to a textual CSV file used
-    for semantic analysis.
+    Streams a flat WhatsApp file and yields a ChatMessage for each
+    message. Continuation lines are folded into the message they belong
+    to, so only one message is held at once. The header format is
+    detected from the first lines of the file.
+
+    The parser remembers where the last message it yielded started. An
+    export that was only appended to can then be parsed from that point
+    with the same header format, instead of from the start of the file.
+    """
+    def __init__(self, headerFormat=None, offset=0, index=0, detect=True):
+        self.headerFormat = headerFormat
+        self.detect = detect
+        self.offset = offset
+        self.index = index
+        self.lastOffset = None
+        self.lastMessage = None
+
+    def scan(self, buffer):
+        """
+        Yields every message in a mapped file. The file is decoded a block
+        at a time and each block is split at its headers in one pass, so
+        lines are not looked at one by one.
+
+        :param buffer: buffer, contents of the whole flat file
+        """
+        if self.detect:
+            self.headerFormat = DetectHeaderFormat(list(islice(mappedLines(buffer, self.offset), SAMPLE_LINES)))
+        headerFormat = self.headerFormat
+        if headerFormat is None:
+            # Unknown formats have to check every line with dateutil.
+            yield from self.parseLines(mappedLines(buffer, self.offset))
+            return
+
+        dateCache = {}
+        timeCache = {}
+        count = self.index
+        current = None
+
+        for blockOffset, text in mappedBlocks(buffer, self.offset):
+            # A carriage return on its own ends a line too, as when reading with newline=''.
+            hasReturns = '\r' in text
+            splitter = HeaderSplitter(headerFormat, hasReturns and text.count('\r') != text.count('\r\n'))
+            lineGroup, dateGroup, timeGroup, personGroup = (splitter.groupindex[name] for name in ('line', 'date', 'time', 'person'))
+            stride = splitter.groups + 1
+
+            # The split alternates the text between headers with the groups of each header.
+            parts = splitter.split(text)
+            if current is not None:
+                current[3].append(parts[0])
+            # Track the byte offset of each header so parsing can be resumed.
+            offset = blockOffset + byteLength(parts[0])
+
+            for i in range(0, len(parts) - 1, stride):
+                line = parts[i + lineGroup]
+                body = parts[i + stride]
+                headerOffset = offset
+                offset += byteLength(line) + byteLength(body)
+
+                # Only headers with a real date and time start a new message.
+                date = dateCache.get(parts[i + dateGroup])
+                time = timeCache.get(parts[i + timeGroup])
+                if date is None or time is None:
+                    header = MatchHeader(line, headerFormat, dateCache, timeCache)
+                    if header is None:
+                        if current is not None:
+                            current[3].extend((line, body))
+                        continue
+                    date, time = header[0], header[1]
+
+                # Flush the previous message.
+                if current is not None:
+                    yield self.flush(count, current)
+                    current = None
+
+                # Lines without a sender aren't messages.
+                person = parts[i + personGroup]
+                if person is None:
+                    continue
+
+                count += 1
+                current = [person, date, time, [body], headerOffset]
+
+        # Do one final flush.
+        if current is not None:
+            yield self.flush(count, current)
+
+    def parseLines(self, lines):
+        # Parse decoded lines one at a time, for handles and unknown formats.
+        headerFormat = self.headerFormat
+        dateCache = {}
+        timeCache = {}
+
+        count = self.index
+        current = None
+        offset = self.offset
+
+        for line in lines:
+            # Track the byte offset of each line so parsing can be resumed.
+            lineOffset = offset
+            offset += byteLength(line)
+            if '\r' in line:
+                line = line[:-2] + '\n' if line.endswith('\r\n') else line[:-1] + '\n'
+
+            # Check if the line is a new message or a previous message.
+            header = MatchHeader(line, headerFormat, dateCache, timeCache)
+            if header is not None:
+                # Flush the previous message.
+                if current is not None:
+                    yield self.flush(count, current)
+                    current = None
+
+                # We have a new conversation.
+                split = header[2].split(': ', 1)
+                if len(split) == 1:
+                    # This likely isn't a valid line.
+                    continue
+
+                count += 1
+                current = [split[0], header[0], header[1], [split[1]], lineOffset]
+            elif current is not None:
+                current[3].append(line)
+
+        # Do one final flush.
+        if current is not None:
+            yield self.flush(count, current)
+
+    def flush(self, count, current):
+        message = "".join(current[3])
+        if '\r' in message:
+            message = message.replace('\r\n', '\n').replace('\r', '\n')
+
+        self.lastOffset = current[4]
+        self.lastMessage = ChatMessage(count, current[0], current[1], current[2], message)
+        return self.lastMessage
+
+# Exports carry no time zone, so their wall clock times are stored as UTC.
+MESSAGE_TIMEZONE = 'UTC'
+
+# Day numbers count the days since this date.
+EPOCH = datetime(1970, 1, 1)
+
+def DayNumber(date):
+    """
+    Returns the number of the day a date falls on.
+
+    :param datetime: date, date to convert
+    """
+    return (date - EPOCH).days
+
+def DayDate(day):
+    """
+    Returns the date at the start of a numbered day.
+
+    :param int: day, number of the day
+    """
+    return EPOCH + timedelta(days=int(day))
+
+def CreateMessageFrame(columns):
+    """
+    Builds the message table from its columns. The date and time are
+    parsed once into a timestamp column, along with the number of the
+    day and the hour of each message, so nothing downstream has to
+    parse them again.
+
+    :param dict: columns, list of values for each of MESSAGE_COLUMNS and optionally the wall clock timestamps
+    """
+    df = pd.DataFrame({column: columns[column] for column in MESSAGE_COLUMNS[1:]},
+                      index=pd.Index(columns['index'], name='index', dtype='int64'))
+    df['person'] = df['person'].astype('category')
+    for column in MESSAGE_COLUMNS[5:]:
+        df[column] = df[column].astype('int64')
+
+    wallClock = columns.get('timestamp')
+    if wallClock is None:
+        minutes = [int(time[:2]) * 60 + int(time[3:]) for time in columns['time']]
+        wallClock = np.array(columns['date'], dtype='datetime64[D]') + np.array(minutes, dtype='timedelta64[m]')
+    wallClock = np.asarray(wallClock, dtype='datetime64[m]')
+
+    df['timestamp'] = pd.DatetimeIndex(wallClock.astype('datetime64[ns]')).tz_localize(MESSAGE_TIMEZONE)
+    df['day'] = wallClock.astype('datetime64[D]').astype(np.int64).astype(np.int32)
+    df['hour'] = (wallClock.astype(np.int64) // 60 % 24).astype(np.int8)
+    return df
+
+def ParseChat(inputPath, consumers, parser=None):
+    """
+    Reads a flat WhatsApp file exactly once and sends every message
+    to each of the consumers in the same pass.
 
     :param string: inputPath, path of input flat file
-    :param string: outputPath, path to output CSV file
+    :param list: consumers, objects with open, consume and close methods
+    :param ChatParser: parser, parser to read with, for resuming part way through the file
     """
+    if parser is None:
+        parser = ChatParser()
+
     try:
-        waFile = open(inputPath, "r", encoding='utf-8')
+        rawFile = open(inputPath, "rb")
     except IOError:
         print("Could not open file "+inputPath+"! Please select a proper file for reading.")
         return False
 
+    # Large exports are mapped rather than read, so they are never held in memory twice.
+    with rawFile:
+        buffer = mapFile(rawFile)
     try:
-        waOut = open(outputPath, "w", encoding='utf-8')
-    except IOError:
-        print("Could not open output file"+outputPath+" for writing! Please select a proper output file.")
-        return False
+        # Skip the byte order mark.
+        if parser.offset == 0 and buffer[:len(codecs.BOM_UTF8)] == codecs.BOM_UTF8:
+            parser.offset = len(codecs.BOM_UTF8)
 
-    contents = waFile.readlines()
+        for consumer in consumers:
+            if not consumer.open():
+                return False
 
-    count = 0
-    currentPerson = ""
-    currentDate = ""
-    currentTime = ""
-    currentMessage = ""
+        for message in parser.scan(buffer):
+            for consumer in consumers:
+                consumer.consume(message)
 
-    # Write the header to the output.
-    waOut.write("index,person,date,time,message,goodSentiment,neutralSentiment,badSentiment\n")
-
-    for line in contents:
-        # Check if the line is a new message or a previous message.
-        split = line.split(' - ', 1)
-        if len(split) == 2 and isDate(split[0]):
-            # Check if we have a previous conversation.
-            if count > 0:
-                # Flush the line.
-                if currentMessage != "\n" and currentMessage != "<Media omitted>\n":
-                    currentMessage = sanitizeStringForCSV(currentMessage)
-                    currentSentiment = GetMessageSentiment(currentMessage)
-
-                    goodSentiment = 0
-                    badSentiment = 0
-                    neutralSentiment = 0
-                    if currentSentiment > 0:
-                        goodSentiment = 1
-                    elif currentSentiment < 0:
-                        badSentiment = 1
-                    else:
-                        neutralSentiment = 1
-
-                    waOut.write(str(count)+","+currentPerson+","+currentDate+","+currentTime+","+currentMessage+","+str(goodSentiment)+","+str(neutralSentiment)+","+str(badSentiment)+"\n")
-
-            # We have a new conversation.
-            split = line.split(': ', 1)
-            if len(split) == 1:
-                # This likely isn't a valid line.
-                continue
-
-            headerSplit = split[0].split(' - ', 1)
-            dateSplit = headerSplit[0].split(', ', 1)
-
-            # Populate the proper fields.
-            count += 1
-            currentPerson = headerSplit[1]
-            currentDate = dateSplit[0]
-            currentTime = dateSplit[1]
-            currentMessage = split[1]
-        else:
-            currentMessage += line
-
-    # Do one final flush.
-    if count != 0 and currentMessage != "\n" and currentMessage != "<Media omitted>\n":
-        currentMessage = sanitizeStringForCSV(currentMessage)
-
-        currentSentiment = GetMessageSentiment(currentMessage)
-        goodSentiment = 0
-        badSentiment = 0
-        neutralSentiment = 0
-        if currentSentiment > 0:
-            goodSentiment = 1
-        elif currentSentiment < 0:
-            badSentiment = 1
-        else:
-            neutralSentiment = 1
-        
-        waOut.write(str(count)+","+currentPerson+","+currentDate+","+currentTime+","+currentMessage+","+str(goodSentiment)+","+str(neutralSentiment)+","+str(badSentiment)+"\n")
-
-    # Close for reading/writing.
-    waOut.close()
-    waFile.close()
+        # Close for reading/writing.
+        for consumer in consumers:
+            consumer.close()
+    finally:
+        if isinstance(buffer, mmap.mmap):
+            buffer.close()
 
     return True
 
-def GenerateEmojiCSVByDate(inputPath, outputPath, stopDate):
-    dateMask = "%Y-%m-%d"
+def countEmojis(message, emojiMap):
+    # Find the full emoji sequences in one pass.
+    emojiMap.update(FindEmojis(message))
 
-    try:
-        waFile = open(inputPath, "r", encoding='utf-8')
-    except IOError:
-        print("Could not open file " + inputPath + "! Please select a proper file for reading.")
-        return False
+def WriteEmojiCSV(emojiMap, outputPath):
+    """
+    Writes emoji counts out as a tab separated UTF-16 file, sorted by
+    incidence number.
 
+    :param dict: emojiMap, count of each emoji
+    :param string: outputPath, path to output CSV file
+    """
     try:
         waOut = open(outputPath, "w", encoding='utf-16')
     except IOError:
-        print("Could not open output file" + outputPath + " for writing! Please select a proper output file.")
+        print("Could not open output file"+outputPath+" for writing! Please select a proper output file.")
         return False
 
-    contents = waFile.readlines()
-
     # Write the header to the output.
     waOut.write("emoji\tfrequency\n")
 
-    emojiMap = {}
-    for line in contents:
-        message = ""
-
-        # Check if the line is a new message or a previous message.
-        split = line.split(' - ', 1)
-        if len(split) == 2 and isDate(split[0]):
-            # Check if the date matches our current day.
-            datSplit = split[0].split(',', 1)
-            date = datetime.strptime(datSplit[0], dateMask)
-            if date > stopDate:
-                break
-
-            # We have a new line.
-            split = line.split(': ', 1)
-            if len(split) == 1:
-                continue
-            message = split[1]
+    # Iterate through our emoji map sorted by incidence number and write out.
+    for emojiItem, frequency in sorted(emojiMap.items(), key=lambda item: item[1]):
+        waOut.write(emojiItem + "\t" + str(frequency) + "\n")
+
+    waOut.close()
+    return True
+
+class ScoredMessageConsumer:
+    """
+    Base for consumers that need the sentiment of every text message.
+    Messages are buffered so their sentiment can be scored in batches.
+    With more than one job, batches are scored in a process pool and
+    handed to write in the order they were read, so the output matches
+    a serial run.
+    """
+    def __init__(self, jobs=1):
+        self.jobs = jobs
+        self.executor = None
+        self.batch = []
+        self.pending = deque()
+
+    def open(self):
+        if self.jobs > 1:
+            self.executor = ProcessPoolExecutor(max_workers=self.jobs)
+        return True
+
+    def sanitize(self, message):
+        return sanitizeMessage(message)
+
+    def consume(self, message):
+        if message.message == "\n" or message.message == "<Media omitted>\n":
+            return
+
+        self.batch.append(message._replace(message=self.sanitize(message.message)))
+        if len(self.batch) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not len(self.batch):
+            return
+
+        messages = [message.message for message in self.batch]
+        if self.executor is None:
+            self.write(self.batch, ScoreMessageSentiments(messages))
         else:
-            message = line
+            self.pending.append((self.batch, self.executor.submit(ScoreMessageSentiments, messages)))
 
-        # Iterate and find the emojis.
-        for c in message:
-            if isEmoji(c):
-                if c in emojiMap:
-                    emojiMap[c] += 1
-                else:
-                    emojiMap[c] = 1
+            # Keep enough batches in flight to occupy the pool without holding the whole chat.
+            while len(self.pending) > self.jobs * 2:
+                self.write(*self.popPending())
+        self.batch = []
 
-    # Sort map by incidence number.
-    emojiMap = {k: v for k, v in sorted(emojiMap.items(), key=lambda item: item[1])}
+    def popPending(self):
+        batch, future = self.pending.popleft()
+        return batch, future.result()
 
-    # Iterate through our emoji map and write out.
-    for emojiItem in emojiMap:
-        waOut.write(emojiItem + "\t" + str(emojiMap[emojiItem]) + "\n")
+    def write(self, batch, sentiments):
+        """
+        Takes a batch of messages along with their sentiment, in the order
+        they were read. Subclasses must override this to store them.
 
-    # Close for reading/writing.
-    waOut.close()
-    waFile.close()
+        :param list: batch, text messages with their sanitized text
+        :param tuple: sentiments, good, neutral and bad score lists for the batch
+        """
+        raise NotImplementedError
 
-    return True
+    def close(self):
+        self.flush()
+        while len(self.pending):
+            self.write(*self.popPending())
 
-def ConvertToEmojiCSV(inputPath, outputPath):
-    try:
-        waFile = open(inputPath, "r", encoding='utf-8')
-    except IOError:
-        print("Could not open file "+inputPath+"! Please select a proper file for reading.")
-        return False
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
 
-    try:
-        waOut = open(outputPath, "w", encoding='utf-16')
-    except IOError:
-        print("Could not open output file"+outputPath+" for writing! Please select a proper output file.")
-        return False
+class MessageFrameBuilder(ScoredMessageConsumer):
+    """
+    Consumer that collects every text message and its sentiment into
+    columns and builds the DataFrame used for semantic analysis once the
+    chat has been read. The frame matches what reading the textual CSV
+    back would give, with the person column stored as a category.
+    """
+    def __init__(self, jobs=1):
+        ScoredMessageConsumer.__init__(self, jobs)
+        self.columns = {column: [] for column in MESSAGE_COLUMNS}
+        self.df = None
+
+    def write(self, batch, sentiments):
+        goodSentiment, neutralSentiment, badSentiment = sentiments
+
+        self.columns['index'].extend(message.index for message in batch)
+        self.columns['person'].extend(message.person for message in batch)
+        self.columns['date'].extend(message.date for message in batch)
+        self.columns['time'].extend(message.time for message in batch)
+        # Messages left empty once emojis are removed are missing, as in the CSV.
+        self.columns['message'].extend(message.message if len(message.message) else None for message in batch)
+        self.columns['goodSentiment'].extend(goodSentiment)
+        self.columns['neutralSentiment'].extend(neutralSentiment)
+        self.columns['badSentiment'].extend(badSentiment)
+
+    def close(self):
+        ScoredMessageConsumer.close(self)
+        self.df = CreateMessageFrame(self.columns)
+        self.columns = None
+
+class TextualCSVWriter(ScoredMessageConsumer):
+    """
+    Consumer that writes each message to the textual CSV file used for
+    semantic analysis.
+    """
+    def __init__(self, outputPath, jobs=1):
+        ScoredMessageConsumer.__init__(self, jobs)
+        self.outputPath = outputPath
+        self.waOut = None
+
+    def open(self):
+        try:
+            self.waOut = open(self.outputPath, "w", encoding='utf-8')
+        except IOError:
+            print("Could not open output file"+self.outputPath+" for writing! Please select a proper output file.")
+            return False
+
+        # Write the header to the output.
+        self.waOut.write(",".join(MESSAGE_COLUMNS) + "\n")
+        return ScoredMessageConsumer.open(self)
+
+    def sanitize(self, message):
+        return sanitizeStringForCSV(message)
+
+    def write(self, batch, sentiments):
+        goodSentiment, neutralSentiment, badSentiment = sentiments
+
+        rows = []
+        for i, message in enumerate(batch):
+            rows.append(str(message.index)+","+message.person+","+message.date+","+message.time+","+message.message+","+str(goodSentiment[i])+","+str(neutralSentiment[i])+","+str(badSentiment[i])+"\n")
+        self.waOut.write("".join(rows))
+
+    def close(self):
+        ScoredMessageConsumer.close(self)
+        self.waOut.close()
+
+class EmojiCounter:
+    """
+    Consumer that counts every emoji used across the whole chat.
+    """
+    def __init__(self):
+        self.emojiMap = Counter()
 
-    contents = waFile.readlines()
+    def open(self):
+        return True
 
-    # Write the header to the output.
-    waOut.write("emoji\tfrequency\n")
+    def consume(self, message):
+        countEmojis(message.message, self.emojiMap)
 
-    emojiMap = {}
-    for line in contents:
-        message = ""
-
-        # Check if the line is a new message or a previous message.
-        split = line.split(' - ', 1)
-        if len(split) == 2 and isDate(split[0]):
-            # We have a new line.
-            split = line.split(': ', 1)
-            if len(split) == 1:
-                continue
-            message = split[1]
-        else:
-            message = line
-
-        # Iterate and find the emojis.
-        for c in message:
-            if isEmoji(c):
-                if c in emojiMap:
-                    emojiMap[c] += 1
-                else:
-                    emojiMap[c] = 1
-    
-    # Sort map by incidence number.
-    emojiMap={k: v for k, v in sorted(emojiMap.items(), key=lambda item: item[1])}
-
-    # Iterate through our emoji map and write out.
-    for emojiItem in emojiMap:
-        waOut.write(emojiItem + "\t" + str(emojiMap[emojiItem]) + "\n")
-    
-    # Close for reading/writing.
-    waOut.close()
-    waFile.close()
+    def close(self):
+        pass
+
+class EmojiByDateCounter:
+    """
+    Consumer that counts emojis per day so the totals up to any date can
+    be produced without reading the chat again.
+    """
+    def __init__(self):
+        self.dailyMaps = {}
+        self.dates = []
+        self.position = 0
+        self.runningMap = Counter()
+
+    def open(self):
+        return True
+
+    def consume(self, message):
+        if message.date not in self.dailyMaps:
+            self.dailyMaps[message.date] = Counter()
+        countEmojis(message.message, self.dailyMaps[message.date])
+
+    def close(self):
+        self.dates = sorted(self.dailyMaps)
+
+    def totals(self):
+        """
+        Returns the emoji counts of the whole chat.
+        """
+        emojiMap = Counter()
+        for dailyMap in self.dailyMaps.values():
+            emojiMap.update(dailyMap)
+        return emojiMap
+
+    def countsUpTo(self, stopDate):
+        """
+        Returns the emoji counts for every message sent on or before the
+        stop date. Stop dates must be passed in increasing order.
+
+        :param datetime: stopDate, last date to include
+        """
+        stopDate = stopDate.strftime("%Y-%m-%d")
+        while self.position < len(self.dates) and self.dates[self.position] <= stopDate:
+            self.runningMap.update(self.dailyMaps[self.dates[self.position]])
+            self.position += 1
+
+        return self.runningMap
+
+def ConvertToMessageFrame(inputPath, jobs=1):
+    """
+    Converts a Flat WhatsApp file to the DataFrame used for semantic
+    analysis. Returns None if the file could not be read.
+
+    :param string: inputPath, path of input flat file
+    :param int: jobs, number of processes used to score sentiment
+    """
+    builder = MessageFrameBuilder(jobs)
+    if not ParseChat(inputPath, [builder]):
+        return None
+
+    return builder.df
+
+def ConvertToTextualCSV(inputPath, outputPath, jobs=1):
+    """
+    Converts a Flat WhatsApp file to a textual CSV file used
+    for semantic analysis.
+
+    :param string: inputPath, path of input flat file
+    :param string: outputPath, path to output CSV file
+    :param int: jobs, number of processes used to score sentiment
+    """
+    return ParseChat(inputPath, [TextualCSVWriter(outputPath, jobs)])
+
+def ConvertToEmojiCSV(inputPath, outputPath):
+    emojiCounter = EmojiCounter()
+    if not ParseChat(inputPath, [emojiCounter]):
+        return False
 
-    return True
\ No newline at end of file
+    return WriteEmojiCSV(emojiCounter.emojiMap, outputPath)
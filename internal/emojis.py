@@ -0,0 +1,90 @@
+# Load all necessary libraries.
+import re
+
+# Characters that attach to the emoji before them: variation selectors,
+# the keycap, skin tones and the tags used by subdivision flags.
+EMOJI_MODIFIERS = '\ufe0e\ufe0f\u20e3\U0001F3FB-\U0001F3FF\U000E0020-\U000E007F'
+EMOJI_JOINER = '\u200d'
+REGIONAL_INDICATORS = '\U0001F1E6-\U0001F1FF'
+
+def LoadEmojiSequences():
+    """
+    Returns every emoji sequence known to the installed emoji package,
+    including joined sequences, skin tones and flags.
+    """
+    try:
+        from emoji import EMOJI_DATA
+        return set(EMOJI_DATA)
+    except ImportError:
+        from emoji import UNICODE_EMOJI
+
+    # Newer releases key the emoji by language.
+    if 'en' in UNICODE_EMOJI:
+        return set(UNICODE_EMOJI['en'])
+    return set(UNICODE_EMOJI)
+
+def firstCharacterClass(chars):
+    # Large classes are checked one item at a time, so only keep the
+    # characters below U+2000 exact and cover the symbol and emoji blocks
+    # above it with one range each. The extra characters let in are
+    # dropped again when the match is looked up.
+    points = sorted(ord(char) for char in chars)
+    items = [re.escape(chr(point)) for point in points if point < 0x2000]
+    for low, high in [(0x2000, 0xFFFF), (0x10000, 0x10FFFF)]:
+        block = [point for point in points if low <= point <= high]
+        if len(block):
+            items.append(re.escape(chr(block[0])) + '-' + re.escape(chr(block[-1])))
+    return '[' + ''.join(items) + ']'
+
+def BuildEmojiRegex(sequences):
+    """
+    Compiles a regex that matches one emoji cluster at a time: a pair of
+    regional indicators, or an emoji followed by its modifiers and any
+    emoji joined onto it.
+
+    :param iterable: sequences, emoji sequences to match
+    """
+    first = firstCharacterClass({sequence[0] for sequence in sequences})
+    regional = '[' + REGIONAL_INDICATORS + ']'
+    emoji = first + '(?:(?<=' + regional + ')' + regional + ')?[' + EMOJI_MODIFIERS + ']*'
+    return re.compile(emoji + '(?:' + EMOJI_JOINER + emoji + ')*')
+
+emojiSequences = LoadEmojiSequences()
+emojiRegex = BuildEmojiRegex(emojiSequences)
+longestEmoji = max(len(sequence) for sequence in emojiSequences)
+
+def isEmoji(s):
+    return s in emojiSequences
+
+def splitCluster(cluster):
+    # Take the longest known sequence from the front until nothing is left.
+    found = []
+    start = 0
+    while start < len(cluster):
+        for end in range(min(len(cluster), start + longestEmoji), start, -1):
+            if cluster[start:end] in emojiSequences:
+                found.append(cluster[start:end])
+                start = end
+                break
+        else:
+            start += 1
+    return found
+
+def FindEmojis(message):
+    """
+    Returns every emoji sequence in a message, in order. Flags, skin
+    tones and joined emojis are kept whole.
+
+    :param string: message, message to search
+    """
+    # Most messages are plain text, so skip them without running the regex.
+    if message.isascii():
+        return []
+
+    found = []
+    for cluster in emojiRegex.findall(message):
+        if cluster in emojiSequences:
+            found.append(cluster)
+        elif len(cluster) > 1:
+            found.extend(splitCluster(cluster))
+    return found
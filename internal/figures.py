@@ -0,0 +1,58 @@
+# Load all necessary libraries.
+import warnings
+from functools import lru_cache
+
+# The chart style, white text and lines for the dark poster.
+CHART_STYLE = {"ytick.color" : "w",
+               "xtick.color" : "w",
+               "axes.labelcolor" : "w",
+               "axes.edgecolor" : "w"}
+
+# Figures kept for the life of the process, by chart name.
+chartFigures = {}
+
+@lru_cache(maxsize=None)
+def loadMatplotlib():
+    import matplotlib
+    matplotlib.use('Agg')
+    matplotlib.rcParams.update(CHART_STYLE)
+    warnings.filterwarnings("ignore", category=UserWarning, module="matplotlib")
+    return matplotlib
+
+def NewFigure(figsize=None, **kwargs):
+    """
+    Creates a figure on the Agg canvas, loading matplotlib and applying
+    the chart style the first time.
+
+    :param tuple: figsize, size of the figure in inches, or None for the default size
+    """
+    loadMatplotlib()
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=figsize, **kwargs)
+    FigureCanvasAgg(fig)
+    return fig
+
+def GetFigure(name, figsize=None, **kwargs):
+    """
+    Returns the figure kept for a chart, cleared so the chart can be
+    drawn into it again. Figures are created once per process on the Agg
+    canvas and are never registered with pyplot, so rendering a poster
+    for each snapshot neither builds new figures nor leaks old ones.
+
+    :param string: name, name of the chart
+    :param tuple: figsize, size of the figure in inches, or None for the default size
+    """
+    key = (name, figsize, tuple(sorted(kwargs.items())))
+    fig = chartFigures.get(key)
+    if fig is None:
+        fig = NewFigure(figsize, **kwargs)
+        chartFigures[key] = fig
+        return fig
+
+    # Charts change the subplot spacing, so reset it along with the contents.
+    rcParams = loadMatplotlib().rcParams
+    fig.clear()
+    fig.subplotpars.update(*[rcParams['figure.subplot.' + side] for side in ('left', 'bottom', 'right', 'top', 'wspace', 'hspace')])
+    return fig
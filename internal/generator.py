@@ -0,0 +1,210 @@
+# Load all necessary libraries.
+import os
+import sys
+import copy
+from argparse import Namespace
+
+from internal.cache import LoadChat
+from internal.canalysis import ScoreMessageSentiments
+from internal.figures import loadMatplotlib
+from internal.incremental import SummarizeMessages
+from internal.incremental import RunningAnalysis
+from internal.pdfgen import CombineHTMLToPDF
+from internal.pdfgen import CompileTemplate
+from internal.pdfgen import LoadPDFEngine
+from internal.pdfgen import templateLocation
+from internal.poster import DateIndex
+from internal.poster import CreateValueDictionary
+from internal.poster import LinkPages
+from internal.poster import DoAnalysis
+from internal.poster import DoOutput
+from internal.profiler import Profile
+from internal.scheduler import RANGE_TYPES
+from internal.scheduler import ListSnapshotDates
+from internal.scheduler import RenderSnapshots
+from internal.wordcloud import LoadMask
+from internal.wordcloud import maskLocation
+
+class PosterGenerator:
+    """
+    Generates posters from flat WhatsApp files. The fonts, mask, charts
+    and scored sentiments are kept for the life of the process. A
+    generator used for many posters only loads them for the first one.
+    """
+    def __init__(self, template='Template1', mask=maskLocation, jobs=1, verbose=True):
+        self.template = template
+        self.mask = mask
+        self.jobs = jobs
+        self.verbose = verbose
+
+    def warm(self):
+        """
+        Loads everything a poster needs that does not depend on the
+        chat: the template, the mask and the sentiment, chart and PDF
+        libraries. Returns False if the template or mask is missing.
+        """
+        if CompileTemplate(self.template) is None:
+            print("Could not find template " + self.template + " in " + templateLocation + "!", file=sys.stderr)
+            return False
+
+        try:
+            LoadMask(self.mask)
+        except IOError:
+            print("Could not open mask " + self.mask + "! Please select a proper image file.", file=sys.stderr)
+            return False
+
+        # Scoring a message loads the sentiment lexicon.
+        ScoreMessageSentiments(["warm"])
+        loadMatplotlib()
+        LoadPDFEngine()
+        return True
+
+    def posterArgs(self, tempDir, outputPath):
+        return Namespace(temp=tempDir, output=outputPath, template=self.template, mask=self.mask)
+
+    def loadChat(self, inputPath, cachePath=None, aliases=None):
+        """
+        Reads a flat WhatsApp file into the message table and its daily
+        emoji counts, renaming people by their aliases. Returns None if
+        the file could not be read.
+
+        :param string: inputPath, path of input flat file
+        :param string: cachePath, path of the message cache, or None to not cache
+        :param dict: aliases, new name of each person to rename
+        """
+        if self.verbose:
+            print("--1) Running Load Tasks--")
+
+        with Profile("Load chat"):
+            chat = LoadChat(inputPath, cachePath, self.jobs)
+        if chat is None:
+            print("Failure processing file! Please try again.", file=sys.stderr)
+            return None
+        df, emojiCounter = chat
+        if df.shape[0] == 0:
+            print("No messages were found in " + inputPath + "! Please select a flat WhatsApp file.", file=sys.stderr)
+            return None
+
+        if self.verbose:
+            print()
+            print("There are {} messages in the chat!".format(df.shape[0]))
+            print("Found {} people in this chat including {}...".format(len(df.person.unique()),
+                                                                            ", ".join(df.person.unique()[0:2])))
+
+        # Note the aliases and change the dataframe.
+        if aliases is not None:
+            for person in df.person.unique():
+                if person in aliases:
+                    if self.verbose:
+                        print("Changing " + person + " to " + aliases[person] + " in the final poster...")
+                    df['person'] = df['person'].astype(object).replace(person, aliases[person]).astype('category')
+
+        return df, emojiCounter
+
+    def generate(self, inputPath, outputPath, tempDir, aliases=None, cache=True):
+        """
+        Generates the poster of a whole chat. Returns False if the
+        poster could not be made.
+
+        :param string: inputPath, path of input flat file
+        :param string: outputPath, path of the PDF to write
+        :param string: tempDir, directory for the images and parsed messages of the poster
+        :param dict: aliases, new name of each person to rename
+        :param bool: cache, whether to keep the parsed messages in the temp directory
+        """
+        try:
+            os.makedirs(tempDir, exist_ok=True)
+        except OSError:
+            print("Error: Could not create directory for temporary files.", file=sys.stderr)
+            return False
+
+        chat = self.loadChat(inputPath, tempDir + "/messages.npz" if cache else None, aliases)
+        if chat is None:
+            return False
+        df, emojiCounter = chat
+
+        args = self.posterArgs(tempDir, outputPath)
+        with Profile("Summarize messages"):
+            summary = SummarizeMessages(df, emojiCounter.totals())
+        with Profile("Analysis"):
+            if not DoAnalysis(args, summary, self.verbose):
+                return False
+        with Profile("Output"):
+            return DoOutput(args, CreateValueDictionary(summary, DateIndex(df['day'])), self.verbose)
+
+    def generateRange(self, inputPath, outputDir, tempDir, rangeType, aliases=None, cache=True, combine=False):
+        """
+        Generates a poster of the chat up to the end of each day, month
+        or year it covers. Returns False if any poster could not be made.
+
+        :param string: inputPath, path of input flat file
+        :param string: outputDir, existing directory the PDFs are written to, or the PDF written when combined
+        :param string: tempDir, directory for the images and parsed messages of the posters
+        :param string: rangeType, either day, month or year
+        :param dict: aliases, new name of each person to rename
+        :param bool: cache, whether to keep the parsed messages in the temp directory
+        :param bool: combine, whether to write every poster as a page of one PDF
+        """
+        if rangeType not in RANGE_TYPES:
+            print("Error: When using range either specify \"year\", \"month\", or \"day\".", file=sys.stderr)
+            return False
+
+        try:
+            os.makedirs(tempDir, exist_ok=True)
+        except OSError:
+            print("Error: Could not create directory for temporary files.", file=sys.stderr)
+            return False
+
+        chat = self.loadChat(inputPath, tempDir + "/messages.npz" if cache else None, aliases)
+        if chat is None:
+            return False
+        df, emojiCounter = chat
+
+        # Index the days with messages once for the poster navigation links.
+        dateIndex = DateIndex(df['day'])
+
+        if self.verbose:
+            print()
+            print("--2) Running Bulk Output Tasks--")
+            print("Output will be created for each " + rangeType + "! This may take a while...")
+
+        # Build the list of snapshots up front.
+        analysis = RunningAnalysis(df, emojiCounter)
+        snapshotDates = ListSnapshotDates(analysis.days, rangeType)
+        pageDates = [curDate.strftime('%Y-%m-%d') for curDate in snapshotDates]
+
+        # Keep running totals as the date advances so each message is only analysed once.
+        # Each snapshot gets its own arguments and temp directory, and its own copy of
+        # the summary when it is rendered by another process.
+        def generateSnapshots():
+            for curDate in snapshotDates:
+                curDateStr = curDate.strftime('%Y-%m-%d')
+                with Profile("Advance summary"):
+                    summary = analysis.advanceTo(curDate)
+                if self.jobs > 1:
+                    summary = copy.deepcopy(summary)
+
+                snapshotArgs = self.posterArgs(tempDir + "/" + curDateStr, outputDir + "/" + curDateStr + ".pdf")
+                valueDict = CreateValueDictionary(summary, dateIndex)
+
+                # Combined posters are pages of one PDF, so their links go to other pages.
+                if combine:
+                    valueDict = LinkPages(valueDict, curDateStr, pageDates)
+                yield snapshotArgs, summary, valueDict, not combine
+
+        with Profile("Render posters", posters=len(snapshotDates), jobs=self.jobs):
+            if not RenderSnapshots(generateSnapshots(), len(snapshotDates), self.jobs):
+                return False
+        if not combine:
+            return True
+
+        # The pages are only merged once every poster is ready, so they are in date order.
+        if self.verbose:
+            print("Combining " + str(len(snapshotDates)) + " posters into " + outputDir + "...")
+        snapshotDirs = [tempDir + "/" + pageDate for pageDate in pageDates]
+        with Profile("Combine PDF", posters=len(snapshotDirs)):
+            status = CombineHTMLToPDF(snapshotDirs, outputDir)
+        if not status:
+            print("Failure writing the posters to " + outputDir + "! Please try again.", file=sys.stderr)
+            return False
+        return True
@@ -0,0 +1,166 @@
+# Load all necessary libraries.
+import re
+from datetime import date as calendarDate
+from datetime import datetime
+from functools import lru_cache
+from dateutil.parser import parse
+
+# The number of lines read from the top of a file to detect its format.
+SAMPLE_LINES = 200
+
+# Date portions of the message headers used by WhatsApp exports. The
+# order of the list is used to break ties when a sample is ambiguous.
+DATE_FORMATS = [
+    ('year-month-day', r'(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})'),
+    ('year/month/day', r'(?P<year>\d{4})/(?P<month>\d{1,2})/(?P<day>\d{1,2})'),
+    ('day/month/year', r'(?P<day>\d{1,2})/(?P<month>\d{1,2})/(?P<year>\d{4}|\d{2})'),
+    ('month/day/year', r'(?P<month>\d{1,2})/(?P<day>\d{1,2})/(?P<year>\d{4}|\d{2})'),
+    ('day.month.year', r'(?P<day>\d{1,2})\.(?P<month>\d{1,2})\.(?P<year>\d{4}|\d{2})'),
+    ('day-month-year', r'(?P<day>\d{1,2})-(?P<month>\d{1,2})-(?P<year>\d{4}|\d{2})'),
+]
+
+# Time portion of the header. Handles 24h and 12h clocks, optional
+# seconds and the AM/PM spellings used by different locales.
+TIME_FORMAT = r'(?P<hour>\d{1,2})[:.](?P<minute>\d{2})(?:[:.]\d{2})?' \
+              r'(?:[ \u00a0\u202f]?(?P<ampm>[AaPp]\.?[ \u00a0\u202f]?[Mm]\.?))?'
+
+# Exports from some phones start each header with left-to-right marks.
+DIRECTION_MARKS = '\u200e'
+
+# Compiled header regexes, one per date format.
+HEADER_FORMATS = [(name, re.compile(r'(?P<date>' + dateFormat + r'),? (?P<time>' + TIME_FORMAT + r') - '))
+                  for name, dateFormat in DATE_FORMATS]
+
+def normalizeDate(match):
+    year = int(match.group('year'))
+    month = int(match.group('month'))
+    day = int(match.group('day'))
+    if year < 100:
+        year += 2000
+
+    # Dates that are not on the calendar, like the 30th of February, are not headers.
+    try:
+        calendarDate(year, month, day)
+    except ValueError:
+        return None
+    return "{:04d}-{:02d}-{:02d}".format(year, month, day)
+
+def normalizeTime(match):
+    hour = int(match.group('hour'))
+    minute = int(match.group('minute'))
+
+    # Convert 12h times to a 24h clock.
+    ampm = match.group('ampm')
+    if ampm is not None:
+        if hour < 1 or hour > 12:
+            return None
+        hour = hour % 12
+        if ampm[0] in 'Pp':
+            hour += 12
+
+    if hour > 23 or minute > 59:
+        return None
+    return "{:02d}:{:02d}".format(hour, minute)
+
+def DetectHeaderFormat(lines):
+    """
+    Determines which header format a WhatsApp export uses from a sample
+    of its lines. The format matching the most headers wins; formats
+    whose dates go backwards in time are penalized, and ties go to the
+    format covering the shortest span of days, which separates the
+    day/month and month/day orderings. Returns None if nothing matches.
+
+    :param list: lines, sample of lines from the top of the file
+    """
+    bestFormat = None
+    bestScore = (0, 0)
+    for name, regex in HEADER_FORMATS:
+        score = 0
+        dates = []
+        for line in lines:
+            match = regex.match(line.lstrip(DIRECTION_MARKS))
+            if match is None:
+                continue
+
+            date = normalizeDate(match)
+            if date is None or normalizeTime(match) is None:
+                continue
+
+            score += 1
+            if len(dates) and date < dates[-1]:
+                score -= 2
+            dates.append(date)
+
+        if not len(dates):
+            continue
+
+        # Chats rarely jump months between consecutive messages.
+        span = (datetime.strptime(max(dates), "%Y-%m-%d") - datetime.strptime(min(dates), "%Y-%m-%d")).days
+        if (score, -span) > bestScore:
+            bestFormat = regex
+            bestScore = (score, -span)
+
+    return bestFormat
+
+@lru_cache(maxsize=None)
+def HeaderSplitter(headerFormat, loneReturns=False):
+    """
+    Compiles a header format to split a whole block of a file at its
+    headers in one pass. Each header, with any left-to-right marks before
+    it, is captured along with its date, its time and the sender up to
+    the first ': ' on the line, when there is one. The other groups of
+    the format are not captured.
+
+    :param regex: headerFormat, format from DetectHeaderFormat
+    :param bool: loneReturns, whether a carriage return on its own also ends a line
+    """
+    pattern = re.sub(r'\(\?P<(?!date>|time>)\w+>', '(?:', headerFormat.pattern)
+    anchor = r'(?m)(?:^|(?<=\r))' if loneReturns else r'(?m)^'
+    return re.compile(anchor + r'(?P<line>[' + DIRECTION_MARKS + r']*' + pattern + r'(?:(?P<person>[^\r\n]*?): )?)')
+
+def MatchHeader(line, headerFormat, dateCache, timeCache):
+    """
+    Checks whether a line starts a new message. Returns the normalized
+    date (YYYY-MM-DD), time (HH:MM) and the remainder of the line, or
+    None for continuation lines. Left-to-right marks before the header
+    are skipped. Unknown formats fall back to dateutil.
+
+    :param string: line, line from the flat file
+    :param regex: headerFormat, format from DetectHeaderFormat or None
+    :param dict: dateCache, raw date text to normalized date
+    :param dict: timeCache, raw time text to normalized time
+    """
+    if headerFormat is None:
+        split = line.split(' - ', 1)
+        if len(split) != 2:
+            return None
+
+        try:
+            timestamp = parse(split[0])
+        except (ValueError, OverflowError):
+            return None
+        return timestamp.strftime("%Y-%m-%d"), timestamp.strftime("%H:%M"), split[1]
+
+    line = line.lstrip(DIRECTION_MARKS)
+    match = headerFormat.match(line)
+    if match is None:
+        return None
+
+    # Most headers share a handful of dates and times so only normalize once.
+    rawDate = match.group('date')
+    date = dateCache.get(rawDate)
+    if date is None:
+        date = normalizeDate(match)
+        if date is None:
+            return None
+        dateCache[rawDate] = date
+
+    rawTime = match.group('time')
+    time = timeCache.get(rawTime)
+    if time is None:
+        time = normalizeTime(match)
+        if time is None:
+            return None
+        timeCache[rawTime] = time
+
+    return date, time, line[match.end():]
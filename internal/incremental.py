@@ -0,0 +1,101 @@
+# Load all necessary libraries.
+import numpy as np
+import pandas as pd
+from collections import Counter
+
+from internal.canalysis import CountMessagesByWeekdayHour
+from internal.canalysis import CountSentiment
+from internal.canalysis import CountWordsByPerson
+from internal.converter import DayNumber
+
+class ChatSummary:
+    """
+    Aggregates of a set of messages that every chart and the poster can
+    be rendered from. The word by person count table feeds both the word
+    use graph and the word clouds. Summaries of consecutive blocks of
+    messages can be added together, so a chat never has to be analysed
+    twice.
+    """
+    def __init__(self):
+        self.persons = []
+        self.messages = 0
+        self.lastDate = None
+        self.wordCounts = pd.DataFrame(dtype=int)
+        self.hourCounts = [0] * 24
+        self.weekdayHourCounts = np.zeros((7, 24), dtype=np.int64)
+        self.sentiment = [0, 0, 0]
+        self.emojiMap = Counter()
+
+    def update(self, other):
+        """
+        Adds the aggregates of a later block of messages to this summary.
+
+        :param ChatSummary: other, summary of the later messages
+        """
+        for person in other.persons:
+            if person not in self.persons:
+                self.persons.append(person)
+        self.messages += other.messages
+        if other.lastDate is not None:
+            self.lastDate = other.lastDate
+
+        self.wordCounts = self.wordCounts.add(other.wordCounts, fill_value=0).fillna(0).astype(int)
+
+        for hour in range(24):
+            self.hourCounts[hour] += other.hourCounts[hour]
+        self.weekdayHourCounts = self.weekdayHourCounts + other.weekdayHourCounts
+        for i in range(3):
+            self.sentiment[i] += other.sentiment[i]
+        self.emojiMap.update(other.emojiMap)
+
+def SummarizeMessages(df, emojiMap=None):
+    """
+    Computes the summary of a block of messages.
+
+    :param DataFrame: df, messages to summarize
+    :param dict: emojiMap, emoji counts of the messages
+    """
+    summary = ChatSummary()
+    if df.shape[0] == 0:
+        return summary
+
+    summary.persons = list(df.person.unique())
+    summary.messages = df.shape[0]
+    summary.lastDate = df['date'].max()
+    summary.wordCounts = CountWordsByPerson(df)
+    # The hourly counts are the weekday by hour counts added up over the week.
+    summary.weekdayHourCounts = CountMessagesByWeekdayHour(df)
+    summary.hourCounts = summary.weekdayHourCounts.sum(axis=0).tolist()
+    summary.sentiment = list(CountSentiment(df))
+    if emojiMap is not None:
+        summary.emojiMap = Counter(emojiMap)
+
+    return summary
+
+class RunningAnalysis:
+    """
+    Keeps a running summary of a chat as a cutoff date advances. Each
+    message is only analysed once, when the cutoff first passes it.
+    """
+    def __init__(self, df, emojiCounter):
+        self.df = df.sort_values('day', kind='stable')
+        self.days = self.df['day'].values
+        self.position = 0
+        self.summary = ChatSummary()
+        self.emojiCounter = emojiCounter
+
+    def advanceTo(self, stopDate):
+        """
+        Adds all messages sent on or before the stop date to the running
+        summary and returns it. Stop dates must be passed in increasing
+        order.
+
+        :param datetime: stopDate, last date to include
+        """
+        end = int(np.searchsorted(self.days, DayNumber(stopDate), side='right'))
+        if end > self.position:
+            self.summary.update(SummarizeMessages(self.df.iloc[self.position:end]))
+            self.position = end
+
+        self.summary.emojiMap = self.emojiCounter.countsUpTo(stopDate)
+        return self.summary
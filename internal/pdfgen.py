@@ -1,14 +1,22 @@
-from weasyprint import HTML
-
 import os
+import re
 import sys
+import shutil
 import subprocess
 from os import path
-from distutils.dir_util import copy_tree
+from functools import lru_cache
 
 templateLocation = "internal/templates/"
+assetName = "internal-images"
 outputName = "index.html"
 
+# Matches the :Key: placeholders in a template.
+placeholderRegex = re.compile(r':([A-Za-z0-9]+):')
+
+# The WeasyPrint renderer of each process, by process id. Renderers inherited
+# from a parent process are kept so their fonts are not removed under it.
+pdfRenderers = {}
+
 # Headless chrome arguments.
 chromeArgs = (
     '{chrome_exec}',
@@ -57,35 +65,106 @@ def findExecutable(executable, path=None):
     else:
         return None
 
-def PrepareHTML(templateName, values, outputDir):
-    # Start by taking the selected template and moving it over.
+@lru_cache(maxsize=None)
+def CompileTemplate(templateName):
+    """
+    Reads a template and splits it around its :Key: placeholders, so
+    text and placeholder names alternate. Templates are compiled once
+    per process. Returns None if the template does not exist.
+
+    :param string: templateName, the name of the template in the templates folder
+    """
     filename = templateLocation + templateName + ".html"
     if not path.exists(filename):
-        return False
+        return None
 
-    # Read in the file
     with open(filename, 'r') as file:
-        htmlContents = file.read()
+        return tuple(placeholderRegex.split(file.read()))
+
+def FillTemplate(tokens, values):
+    """
+    Fills in a compiled template in a single pass. Placeholders without
+    a value are left as they are.
+
+    :param tuple: tokens, template compiled by CompileTemplate
+    :param dict: values, value of each placeholder name
+    """
+    parts = list(tokens)
+    for i in range(1, len(parts), 2):
+        parts[i] = values.get(parts[i], ":" + parts[i] + ":")
+    return "".join(parts)
+
+def linkAssets(outputDir):
+    # Every poster uses the same images, so link to them instead of copying them.
+    # A directory copied by an older version is kept up to date as before.
+    source = path.abspath(templateLocation + assetName)
+    target = outputDir + "/" + assetName
+    if path.islink(target):
+        if os.readlink(target) == source:
+            return
+        os.unlink(target)
 
-    # Do a find and replace for all dictionary values.
-    for key, value in values.items():
-        htmlContents = htmlContents.replace(":" + key + ":", value)
+    if not path.exists(target):
+        try:
+            os.symlink(source, target, target_is_directory=True)
+            return
+        except OSError:
+            # Links need extra privileges on Windows.
+            pass
+    shutil.copytree(source, target, dirs_exist_ok=True)
 
-    # Write the file out again
+def PrepareHTML(templateName, values, outputDir):
+    # Start by taking the selected template.
+    tokens = CompileTemplate(templateName)
+    if tokens is None:
+        return False
+
+    # Write the template out with all dictionary values filled in.
     with open(outputDir + "/" + outputName, 'w') as file:
-        file.write(htmlContents)
+        file.write(FillTemplate(tokens, values))
 
-    # Copy the image directory.
-    copy_tree(templateLocation + "internal-images", outputDir + "/internal-images")
+    # Link the image directory.
+    linkAssets(outputDir)
     return True
 
-def ConvertHTMLToPDF(inputDir, outputFileName):
+def GetPDFRenderer():
+    """
+    Returns the WeasyPrint renderer of this process, creating it the
+    first time.
+    """
+    renderer = pdfRenderers.get(os.getpid())
+    if renderer is None:
+        from internal.renderer import PDFRenderer
+        renderer = pdfRenderers[os.getpid()] = PDFRenderer(assetName)
+    return renderer
+
+def LoadPDFEngine():
+    """
+    Loads the selected PDF generator ahead of the first poster, so a
+    long running process does not pay for it on a request.
+    """
     if PDF_ENGINE == 0:
-        # Start by opening the temporary file.
-        tempPoster = HTML(filename=inputDir + "/" + outputName)
+        GetPDFRenderer()
 
-        # Write the object.
-        tempPoster.write_pdf(outputFileName)
+def CombineHTMLToPDF(inputDirs, outputFileName):
+    """
+    Writes a batch of posters as the pages of a single PDF, in order.
+    Only WeasyPrint can merge posters. Returns False if the PDF could
+    not be written.
+
+    :param list: inputDirs, directory of each poster's filled in template
+    :param string: outputFileName, path of the PDF to write
+    """
+    if PDF_ENGINE != 0 or not len(inputDirs):
+        return False
+
+    htmlPaths = [path.abspath(inputDir + "/" + outputName) for inputDir in inputDirs]
+    return GetPDFRenderer().writeCombined(htmlPaths, outputFileName)
+
+def ConvertHTMLToPDF(inputDir, outputFileName):
+    if PDF_ENGINE == 0:
+        # Write the temporary file with the renderer kept by this process.
+        GetPDFRenderer().write(path.abspath(inputDir + "/" + outputName), outputFileName)
     elif PDF_ENGINE == 1:
         # Find the Chrome installation.
         chromeLoc = findExecutable('google-chrome-stable')
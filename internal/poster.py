@@ -0,0 +1,247 @@
+# Load specific libraries.
+import sys
+import os
+import bisect
+import numpy as np
+from dateutil.relativedelta import relativedelta
+
+from internal.converter import DayNumber
+from internal.converter import DayDate
+from internal.pdfgen import ConvertHTMLToPDF
+from internal.pdfgen import PrepareHTML
+
+from internal.wordcloud import RenderWordClouds
+from internal.wordcloud import RenderEmojiWordCloud
+from internal.canalysis import RenderTextingFrequency
+from internal.canalysis import RenderMessageSentimateProportion
+from internal.canalysis import RenderWordUseFrequency
+from internal.canalysis import SelectParticipants
+from internal.canalysis import WriteTextingFrequency
+from internal.profiler import Profile
+import pandas as pd
+
+# Perform inital setup.
+pd.options.mode.chained_assignment = None
+
+# Values holding the dates a poster's navigation links go to.
+NAVIGATION_KEYS = ['DayBack', 'MonthBack', 'YearBack', 'DayForward', 'MonthForward', 'YearForward']
+
+class DateIndex:
+    """
+    Sorted numbers of the days a chat has messages on, built once so the
+    nearest day with messages can be found by bisection.
+    """
+    def __init__(self, days):
+        self.days = np.unique(days)
+        self.minDate = DayDate(self.days[0])
+        self.maxDate = DayDate(self.days[-1])
+
+    def nearest(self, date, back):
+        """
+        Returns the closest day with messages on or before the date when
+        going back, or on or after it when going forward. Dates outside
+        the chat are moved to its first or last day.
+
+        :param datetime: date, date to start looking from
+        :param bool: back, whether to look back in time
+        """
+        if date < self.minDate:
+            return self.minDate
+        elif date > self.maxDate:
+            return self.maxDate
+
+        if back:
+            day = self.days[np.searchsorted(self.days, DayNumber(date), side='right') - 1]
+        else:
+            day = self.days[np.searchsorted(self.days, DayNumber(date), side='left')]
+        return DayDate(day)
+
+def CreateValueDictionary(summary, dateIndex):
+    valueDict = {}
+
+    # First, get the names of the people drawn.
+    count = 1
+    for name in SelectParticipants(summary.wordCounts, summary.persons)[0]:
+        strippedName = name.replace(" ", "")
+        name = name.split(' ', 1)[0]
+
+        valueDict['Name' + str(count)] = name
+        valueDict['FullName' + str(count)] = strippedName
+
+        count += 1
+
+    # Get the number of messages.
+    numMessages = summary.messages
+    valueDict['Messages'] = str(f'{numMessages:n}')
+
+    # Get the number of years the messages take place over.
+    dateFormat = '%Y-%m-%d'
+    minDate = dateIndex.minDate
+    maxDate = dateIndex.maxDate
+    years = relativedelta(maxDate, minDate).years
+    months = relativedelta(maxDate, minDate).months
+    if months >= 5:
+        years += 1
+    valueDict['Years'] = str(years)
+
+    # State the maximum current date.
+    valueDict['Date'] = summary.lastDate
+    curDate = maxDate
+
+    # Print the associated back URLs.
+    backDay = dateIndex.nearest(curDate - relativedelta(days=1), True)
+    backMonth = dateIndex.nearest(curDate - relativedelta(months=1), True)
+    backYear = dateIndex.nearest(curDate - relativedelta(years=1), True)
+    valueDict['DayBack'] = backDay.strftime(dateFormat)
+    valueDict['MonthBack'] = backMonth.strftime(dateFormat)
+    valueDict['YearBack'] = backYear.strftime(dateFormat)
+
+    # Print the associated forward URLs.
+    forwardDay = dateIndex.nearest(curDate + relativedelta(days=1), False)
+    forwardMonth = dateIndex.nearest(curDate + relativedelta(months=1), False)
+    forwardYear = dateIndex.nearest(curDate + relativedelta(years=1), False)
+    valueDict['DayForward'] = forwardDay.strftime(dateFormat)
+    valueDict['MonthForward'] = forwardMonth.strftime(dateFormat)
+    valueDict['YearForward'] = forwardYear.strftime(dateFormat)
+
+    # Link to the posters of those dates by their directories.
+    for key in NAVIGATION_KEYS:
+        valueDict[key + 'Link'] = "../" + valueDict[key] + "/index.html"
+    valueDict['PosterId'] = "poster-" + valueDict['Date']
+
+    # Get the number of years the chat is.
+    return valueDict
+
+def LinkPages(valueDict, pageDate, pageDates):
+    """
+    Points a poster's navigation links at the pages of a combined PDF. A
+    date is linked to the first page whose cutoff includes it.
+
+    :param dict: valueDict, values of the poster drawn on the page
+    :param string: pageDate, cutoff date of the poster's page
+    :param list: pageDates, sorted cutoff dates of every page
+    """
+    valueDict['PosterId'] = "poster-" + pageDate
+    for key in NAVIGATION_KEYS:
+        page = min(bisect.bisect_left(pageDates, valueDict[key]), len(pageDates) - 1)
+        valueDict[key + 'Link'] = "#poster-" + pageDates[page]
+    return valueDict
+
+def DoAnalysis(args, summary, verbose = True):
+    """
+    Renders the word clouds and charts of a poster into its temp
+    directory. Returns False if any of them could not be rendered.
+
+    :param Namespace: args, arguments with the poster's temp directory and mask
+    :param ChatSummary: summary, summary of the messages on the poster
+    :param bool: verbose, whether to print each step
+    """
+    if verbose:
+        print()
+        print("--2) Running Analysis Tasks--")
+
+    # Large groups are drawn as their most active people and everyone else.
+    names, wordCounts = SelectParticipants(summary.wordCounts, summary.persons)
+
+    # Generate the word cloud.
+    if verbose:
+        print("Creating wordclouds for " + str(len(names)) + " people and for emojis...")
+    with Profile("Word clouds", 'chart', people=len(names)):
+        status = RenderWordClouds(wordCounts, args.temp, args.mask)
+    if not status:
+        print("Failure generating word cloud! Please try again.", file=sys.stderr)
+        return False
+    with Profile("Emoji word cloud", 'chart'):
+        status = RenderEmojiWordCloud(summary.emojiMap, args.temp)
+    if not status:
+        print("Failure generating emoji-based word cloud! Please try again.", file=sys.stderr)
+        return False
+
+    if verbose:
+        print("Generating the number of times the most common words are used...")
+    with Profile("Word use frequency", 'chart'):
+        status = RenderWordUseFrequency(wordCounts, args.temp)
+    if not status:
+        print("Failure generating word use graph! Please try again.", file=sys.stderr)
+        return False
+
+    # Do text time analysis.
+    if verbose:
+        print("Determining frequency of messages sent on an hourly basis...")
+    with Profile("Texting frequency", 'chart'):
+        status = RenderTextingFrequency(summary.hourCounts, args.temp)
+    if not status:
+        print("Failure generating text frequency! Please try again.", file=sys.stderr)
+        return False
+    with Profile("Texting frequency data", 'chart'):
+        status = WriteTextingFrequency(summary.weekdayHourCounts, args.temp)
+    if not status:
+        print("Failure writing text frequency data! Please try again.", file=sys.stderr)
+        return False
+
+    # Run other misc statistics.
+    if verbose:
+        print("Determining the sentiment breakdown...")
+    goodSentiment, neutralSentiment, badSentiment = summary.sentiment
+    with Profile("Sentiment proportion", 'chart'):
+        status = RenderMessageSentimateProportion(goodSentiment, neutralSentiment, badSentiment, args.temp)
+    if not status:
+        print("Failure generating sentiment breakdown! Please try again.", file=sys.stderr)
+        return False
+
+    return True
+
+def DoOutput(args, valueDict, verbose = True, writePDF = True):
+    """
+    Fills in the poster template and writes it out as a PDF. Returns
+    False if the poster could not be written.
+
+    :param Namespace: args, arguments with the poster's temp directory, template and output path
+    :param dict: valueDict, values to fill the poster template with
+    :param bool: verbose, whether to print each step
+    :param bool: writePDF, whether to write the PDF or only fill in the template
+    """
+    if verbose:
+        print()
+        print("--3) Running PDF Generation Tasks--")
+
+    if verbose:
+        print("Generating PDF of poster with semantic analysis...")
+        print()
+    with Profile("Fill template"):
+        status = PrepareHTML(args.template, valueDict, args.temp)
+    if not status:
+        print("Failure creating template for poster. Please check the poster template exists.", file=sys.stderr)
+        return False
+    if not writePDF:
+        return True
+
+    with Profile("Write PDF"):
+        status = ConvertHTMLToPDF(args.temp, args.output)
+    if not status:
+        print("Failure writing the poster to " + args.output + "! Please try again.", file=sys.stderr)
+        return False
+
+    return True
+
+def RenderSnapshot(args, summary, valueDict, writePDF = True):
+    """
+    Renders the charts and poster of a single range snapshot into its
+    own temporary directory. Runs inside a worker process. Returns the
+    path of the poster, or None if it could not be made.
+
+    :param Namespace: args, arguments with the snapshot's temp and output paths
+    :param ChatSummary: summary, summary of the chat up to the snapshot
+    :param dict: valueDict, values to fill the poster template with
+    :param bool: writePDF, whether to write the PDF or leave the filled in template for a combined PDF
+    """
+    try:
+        os.makedirs(args.temp, exist_ok=True)
+    except OSError:
+        print("Error: Could not create directory for temporary files.", file=sys.stderr)
+        return None
+
+    with Profile("Snapshot", 'snapshot', date=valueDict['Date'], messages=int(summary.messages)):
+        if not DoAnalysis(args, summary, False) or not DoOutput(args, valueDict, False, writePDF):
+            return None
+    return args.output if writePDF else args.temp
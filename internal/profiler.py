@@ -0,0 +1,188 @@
+# Load all necessary libraries.
+import os
+import sys
+import json
+import time
+from contextlib import contextmanager
+from contextlib import nullcontext
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# The profiler of this process, or None when stages are not profiled.
+activeProfiler = None
+
+def currentRSS():
+    # The resident set size of this process in bytes, or None where it cannot be read.
+    try:
+        with open("/proc/self/statm", "r") as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+def peakRSS():
+    # The largest resident set size of this process so far in bytes, or None where it cannot be read.
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def difference(end, start):
+    return None if end is None or start is None else end - start
+
+class StageProfiler:
+    """
+    Records the wall time, CPU time and memory of each stage run by this
+    process. Stages nest, so a stage's times include those of the stages
+    run inside it. The CPU time is of this process only, not of the
+    workers it waits on.
+    """
+    def __init__(self):
+        self.records = []
+        self.depth = 0
+
+    @contextmanager
+    def stage(self, name, category, details):
+        startRSS = currentRSS()
+        startPeak = peakRSS()
+        startCPU = time.process_time()
+        start = time.perf_counter()
+
+        record = {'name': name, 'category': category, 'args': dict(details), 'pid': os.getpid(), 'depth': self.depth}
+        self.records.append(record)
+        self.depth += 1
+        try:
+            yield record
+        finally:
+            self.depth -= 1
+            record['start'] = start
+            record['wall'] = time.perf_counter() - start
+            record['cpu'] = time.process_time() - startCPU
+            record['rss'] = currentRSS()
+            record['rssDelta'] = difference(record['rss'], startRSS)
+            record['peakRSS'] = peakRSS()
+            record['peakDelta'] = difference(record['peakRSS'], startPeak)
+
+    def merge(self, records):
+        """
+        Adds the stages recorded by a worker process, nested under the
+        stage this process is running.
+
+        :param list: records, stages recorded by the worker
+        """
+        for record in records:
+            record['depth'] += self.depth
+            self.records.append(record)
+
+def StartProfiling():
+    """
+    Starts recording the stages run by this process, dropping any that
+    were recorded before.
+    """
+    global activeProfiler
+    activeProfiler = StageProfiler()
+    return activeProfiler
+
+def StopProfiling():
+    """
+    Stops recording stages and returns the ones recorded, or an empty
+    list if stages were not being profiled.
+    """
+    global activeProfiler
+    profiler = activeProfiler
+    activeProfiler = None
+    return profiler.records if profiler is not None else []
+
+def IsProfiling():
+    return activeProfiler is not None
+
+def Profile(name, category='stage', **details):
+    """
+    Returns a context that records the stage run inside it when
+    profiling, and does nothing otherwise.
+
+    :param string: name, name of the stage, shared by every run of it
+    :param string: category, kind of stage, such as stage, chart or snapshot
+    :param details: values noted with this run of the stage in the trace
+    """
+    if activeProfiler is None:
+        return nullcontext()
+    return activeProfiler.stage(name, category, details)
+
+def MergeProfile(records):
+    """
+    Adds the stages recorded by a worker process to this one's profile.
+
+    :param list: records, stages recorded by the worker
+    """
+    if activeProfiler is not None:
+        activeProfiler.merge(records)
+
+def formatBytes(value):
+    return "" if value is None else "{:.1f}".format(value / (1 << 20))
+
+def PrintProfileSummary(records):
+    """
+    Prints a table of the stages recorded, one row for each stage name in
+    the order they first ran. Stages that ran many times, such as the
+    charts of every range snapshot, are summed.
+
+    :param list: records, stages recorded by the profiler
+    """
+    rows = {}
+    for record in sorted(records, key=lambda record: record['start']):
+        row = rows.setdefault(record['name'], {'depth': record['depth'], 'count': 0, 'wall': 0.0, 'cpu': 0.0,
+                                               'rssDelta': None, 'peakRSS': None})
+        row['count'] += 1
+        row['wall'] += record['wall']
+        row['cpu'] += record['cpu']
+        if record['rssDelta'] is not None:
+            row['rssDelta'] = (row['rssDelta'] or 0) + record['rssDelta']
+        if record['peakRSS'] is not None:
+            row['peakRSS'] = max(row['peakRSS'] or 0, record['peakRSS'])
+
+    print()
+    print("--Profile--")
+    print("{:44} {:>6} {:>10} {:>10} {:>14} {:>16}".format("Stage", "Runs", "Wall (s)", "CPU (s)", "Peak RSS (MiB)", "RSS Change (MiB)"))
+    for name, row in rows.items():
+        print("{:44} {:>6} {:>10.3f} {:>10.3f} {:>14} {:>16}".format(("  " * row['depth'] + name)[:44], row['count'], row['wall'], row['cpu'],
+                                                                   formatBytes(row['peakRSS']), formatBytes(row['rssDelta'])))
+
+def WriteChromeTrace(records, outputFileName):
+    """
+    Writes the stages recorded as a Chrome trace, which can be opened in
+    chrome://tracing or Perfetto. Each stage is a complete event with its
+    CPU time and memory as arguments, and each process has a counter of
+    its resident set size. Returns False if the trace could not be written.
+
+    :param list: records, stages recorded by the profiler
+    :param string: outputFileName, path of the JSON file to write
+    """
+    # Workers time their stages with the same monotonic clock, so every process shares the origin.
+    origin = min([record['start'] for record in records], default=0.0)
+    mainPid = os.getpid()
+    events = []
+    for pid in sorted(set([record['pid'] for record in records])):
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': pid,
+                       'args': {'name': 'whatsapp-poster' if pid == mainPid else 'worker ' + str(pid)}})
+
+    for record in records:
+        timestamp = (record['start'] - origin) * 1e6
+        args = dict(record['args'])
+        args.update({'cpuSeconds': record['cpu'], 'rssBytes': record['rss'], 'rssChangeBytes': record['rssDelta'],
+                     'peakRSSBytes': record['peakRSS'], 'peakRSSChangeBytes': record['peakDelta']})
+        events.append({'name': record['name'], 'cat': record['category'], 'ph': 'X', 'ts': timestamp,
+                       'dur': record['wall'] * 1e6, 'pid': record['pid'], 'tid': record['pid'], 'args': args})
+        if record['rss'] is not None:
+            events.append({'name': 'RSS (MiB)', 'ph': 'C', 'ts': timestamp + record['wall'] * 1e6, 'pid': record['pid'],
+                           'tid': record['pid'], 'args': {'rss': record['rss'] / (1 << 20)}})
+
+    try:
+        with open(outputFileName, "w") as traceFile:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, traceFile, default=str)
+    except (IOError, OSError):
+        print("Could not write the profile to " + outputFileName + "!", file=sys.stderr)
+        return False
+    return True
@@ -0,0 +1,112 @@
+# Load all necessary libraries.
+from os import path
+from urllib.parse import urljoin
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+from weasyprint import HTML
+from weasyprint.text.fonts import FontConfiguration
+from weasyprint.urls import URLFetcher
+from weasyprint.urls import URLFetcherResponse
+from weasyprint.urls import path2url
+
+# WeasyPrint caches decoded images by the URL they were loaded from, and a local
+# image file is only read again when the PDF is written. The renderer relies on
+# both: template images are handed to each poster under that poster's URLs, and
+# local files are fetched from their real paths so later reads do not go through
+# a poster directory that has since been removed.
+
+class CachingURLFetcher(URLFetcher):
+    """
+    Fetches the stylesheets, fonts and images of posters for WeasyPrint.
+    Remote resources, like the web fonts the templates link to, are only
+    downloaded once per process. Failed downloads are remembered too, so
+    a host without network access only waits on each of them once for
+    the life of the process. Local files are fetched from their real
+    path, so the template images a poster reaches through its link stay
+    readable after the poster's directory is removed.
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.responses = {}
+
+    def fetch(self, url, headers=None):
+        if url.startswith('file:'):
+            return super().fetch(path2url(path.realpath(url2pathname(urlparse(url).path))), headers)
+        elif not url.startswith(('http:', 'https:')):
+            return super().fetch(url, headers)
+
+        if url not in self.responses:
+            try:
+                response = super().fetch(url, headers)
+                try:
+                    self.responses[url] = (response.url, response.read(), response.headers, response.status)
+                finally:
+                    response.close()
+            except Exception as error:
+                self.responses[url] = error
+                raise
+
+        cached = self.responses[url]
+        if isinstance(cached, Exception):
+            # WeasyPrint skips the resource as it did the first time.
+            raise cached.with_traceback(None)
+        responseURL, body, responseHeaders, status = cached
+        return URLFetcherResponse(responseURL, body, responseHeaders, status)
+
+class PDFRenderer:
+    """
+    Writes posters as PDFs with WeasyPrint. What does not change between
+    posters is kept for the life of the process: one font configuration,
+    so system and web fonts are only loaded once, the remote resources
+    of the templates and the decoded template images.
+    """
+    def __init__(self, assetName):
+        self.assetName = assetName
+        self.fontConfig = FontConfiguration()
+        self.urlFetcher = CachingURLFetcher()
+        self.assetImages = {}
+
+    def render(self, htmlPath):
+        """
+        Lays out a poster and returns the WeasyPrint document.
+
+        :param string: htmlPath, path of the filled in template
+        """
+        html = HTML(filename=htmlPath, url_fetcher=self.urlFetcher)
+
+        # WeasyPrint caches images by URL. Every poster reaches the template images
+        # through its own link, so they are cached under this poster's URLs for them.
+        # The cache is dropped with the poster, as charts are drawn again at the same paths.
+        assetURL = urljoin(html.base_url, self.assetName + "/")
+        cache = {assetURL + name: image for name, image in self.assetImages.items()}
+        document = html.render(font_config=self.fontConfig, cache=cache)
+
+        for url, image in cache.items():
+            if url.startswith(assetURL) and image is not None:
+                self.assetImages[url[len(assetURL):]] = image
+        return document
+
+    def write(self, htmlPath, outputFileName):
+        """
+        Lays out a poster and writes it as a PDF.
+
+        :param string: htmlPath, path of the filled in template
+        :param string: outputFileName, path of the PDF to write
+        """
+        self.render(htmlPath).write_pdf(outputFileName)
+        return True
+
+    def writeCombined(self, htmlPaths, outputFileName):
+        """
+        Lays out many posters and writes them as the pages of one PDF, in
+        order. The fonts and template images the posters share are only
+        stored once in it.
+
+        :param list: htmlPaths, paths of the filled in templates
+        :param string: outputFileName, path of the PDF to write
+        """
+        documents = [self.render(htmlPath) for htmlPath in htmlPaths]
+        pages = [page for document in documents for page in document.pages]
+        documents[0].copy(pages).write_pdf(outputFileName)
+        return True
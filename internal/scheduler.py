@@ -0,0 +1,107 @@
+# Load all necessary libraries.
+import sys
+import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dateutil.relativedelta import relativedelta
+
+from internal.converter import DayNumber
+from internal.converter import DayDate
+from internal.poster import RenderSnapshot
+from internal.profiler import IsProfiling
+from internal.profiler import MergeProfile
+from internal.profiler import StartProfiling
+from internal.profiler import StopProfiling
+
+# The lengths of time a range of posters can step by.
+RANGE_TYPES = ('day', 'month', 'year')
+
+def ListSnapshotDates(days, rangeType):
+    """
+    Lists the cutoff date of every snapshot in range mode. A cutoff only
+    produces a snapshot when it includes messages the previous one did not.
+
+    :param array: days, sorted day numbers of every message
+    :param string: rangeType, either day, month or year
+    """
+    minDate = DayDate(days[0])
+    maxDate = DayDate(days[-1])
+    curDate = minDate
+
+    snapshotDates = []
+    oldRows = 0
+    while curDate <= maxDate:
+        if rangeType == 'month':
+            curDate = curDate + relativedelta(months=1)
+        elif rangeType == 'year':
+            curDate = curDate + relativedelta(years=1)
+
+        # Ensure we have different data.
+        curRows = int(np.searchsorted(days, DayNumber(curDate), side='right'))
+        if curRows != oldRows:
+            snapshotDates.append(curDate)
+            oldRows = curRows
+
+        if rangeType == 'day':
+            curDate = curDate + relativedelta(days=1)
+
+    return snapshotDates
+
+def profileSnapshot(*snapshot):
+    # Profile a snapshot in a worker process and send its stages back with the result.
+    StartProfiling()
+    output = RenderSnapshot(*snapshot)
+    return output, StopProfiling()
+
+def RenderSnapshots(snapshots, total, jobs):
+    """
+    Renders every range snapshot, using a pool of worker processes when
+    more than one job is requested. Each worker has its own matplotlib
+    state and each snapshot its own temp directory. Snapshots are pulled
+    lazily so only a few summaries are held in memory at once. Returns
+    False if any snapshot could not be rendered. When profiling, the
+    stages of the snapshots rendered by workers are added to the profile.
+
+    :param iterable: snapshots, (args, summary, valueDict, writePDF) for each snapshot
+    :param int: total, number of snapshots
+    :param int: jobs, maximum number of snapshots rendered at once
+    """
+    completed = 0
+    failed = 0
+    def report(output, snapshotArgs):
+        nonlocal completed, failed
+        completed += 1
+        if output is None:
+            failed += 1
+            print("Failed poster " + str(completed) + " of " + str(total) + ": " + snapshotArgs.output, file=sys.stderr)
+        else:
+            print("Completed poster " + str(completed) + " of " + str(total) + ": " + output)
+
+    if jobs == 1:
+        for snapshot in snapshots:
+            report(RenderSnapshot(*snapshot), snapshot[0])
+        return failed == 0
+
+    profiling = IsProfiling()
+    def collect(future):
+        output = future.result()
+        if profiling:
+            output, records = output
+            MergeProfile(records)
+        return output
+
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for snapshot in snapshots:
+            pending.append((executor.submit(profileSnapshot if profiling else RenderSnapshot, *snapshot), snapshot[0]))
+
+            # Keep enough snapshots in flight to occupy the pool.
+            while len(pending) > jobs * 2:
+                future, snapshotArgs = pending.popleft()
+                report(collect(future), snapshotArgs)
+
+        while len(pending):
+            future, snapshotArgs = pending.popleft()
+            report(collect(future), snapshotArgs)
+
+    return failed == 0
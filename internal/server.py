@@ -0,0 +1,135 @@
+# Load all necessary libraries.
+import sys
+import signal
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from urllib.parse import urlparse
+from urllib.parse import parse_qs
+
+from internal.generator import PosterGenerator
+
+# The largest flat file accepted, in bytes.
+MAX_UPLOAD_SIZE = 256 << 20
+
+# The generator of a worker process, created when the worker starts.
+workerGenerator = None
+
+def startWorker(template, mask):
+    global workerGenerator
+    workerGenerator = PosterGenerator(template, mask, verbose=False)
+    workerGenerator.warm()
+
+def warmWorker():
+    return True
+
+def generatePoster(chat, aliases, tempRoot):
+    # Each poster is made in its own temp directory, removed once the PDF has been read.
+    tempDir = tempfile.mkdtemp(prefix="poster-", dir=tempRoot)
+    try:
+        inputPath = tempDir + "/chat.txt"
+        outputPath = tempDir + "/poster.pdf"
+        with open(inputPath, "wb") as chatFile:
+            chatFile.write(chat)
+
+        if not workerGenerator.generate(inputPath, outputPath, tempDir, aliases, False):
+            return None
+        with open(outputPath, "rb") as pdfFile:
+            return pdfFile.read()
+    finally:
+        shutil.rmtree(tempDir, ignore_errors=True)
+
+class PosterRequestHandler(BaseHTTPRequestHandler):
+    """
+    Turns a flat WhatsApp file POSTed to /poster into a poster and sends
+    the PDF back. People are renamed with alias=old-name:new-name query
+    parameters. Requests are handled on their own threads and the
+    posters are made by the server's worker pool.
+    """
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/poster":
+            self.send_error(404, "Posters are made by posting a chat to /poster")
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            self.send_error(400, "Invalid Content-Length")
+            return
+        if length <= 0:
+            self.send_error(400, "The flat WhatsApp file must be sent as the request body")
+            return
+        if length > MAX_UPLOAD_SIZE:
+            self.send_error(413, "The flat WhatsApp file is larger than " + str(MAX_UPLOAD_SIZE) + " bytes")
+            return
+
+        aliases = {}
+        for alias in parse_qs(url.query).get('alias', []):
+            aSplit = alias.split(':')
+            if len(aSplit) < 2:
+                self.send_error(400, "Aliases must be in the form of old-name:new-name")
+                return
+            aliases.setdefault(aSplit[0], aSplit[1])
+
+        chat = self.rfile.read(length)
+        try:
+            pdf = self.server.executor.submit(generatePoster, chat, aliases, self.server.tempRoot).result()
+        except Exception as error:
+            print("Failure generating poster: " + repr(error), file=sys.stderr)
+            pdf = None
+
+        if pdf is None:
+            self.send_error(500, "The poster could not be generated")
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(pdf)))
+        self.end_headers()
+        self.wfile.write(pdf)
+
+def ServePosters(host, port, template, mask, tempRoot, jobs):
+    """
+    Serves posters over HTTP until interrupted. Each worker process
+    keeps its own warm generator, so only the chat is processed for
+    each request. Returns False if the server could not be started.
+
+    :param string: host, address to listen on
+    :param int: port, port to listen on
+    :param string: template, the name of the template in the templates folder to use
+    :param string: mask, image whose shape the word clouds are drawn in
+    :param string: tempRoot, existing directory each poster's temp directory is made in
+    :param int: jobs, number of posters made at once
+    """
+    # Load everything once before the workers start, so they share it where the platform forks.
+    if not PosterGenerator(template, mask, verbose=False).warm():
+        return False
+
+    try:
+        server = ThreadingHTTPServer((host, port), PosterRequestHandler)
+    except OSError:
+        print("Error: Could not listen on " + host + ":" + str(port) + ".", file=sys.stderr)
+        return False
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=startWorker, initargs=(template, mask)) as executor:
+        # Start the workers now rather than on the first requests.
+        for future in [executor.submit(warmWorker) for _ in range(jobs)]:
+            future.result()
+
+        server.executor = executor
+        server.tempRoot = tempRoot
+        print("Serving posters on http://" + host + ":" + str(port) + "/poster with " + str(jobs) + " workers...")
+
+        # Stop the same way on a terminate signal as on an interrupt.
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+    return True
@@ -1,53 +1,106 @@
 # Load all necessary libraries.
 import numpy as np
-import string
 from os import path
 from os import getcwd
-from PIL import Image
-from wordcloud import WordCloud, STOPWORDS, ImageColorGenerator
-
-import urllib
-import requests
-
-import matplotlib.pyplot as plt
 
 import random
-from palettable.colorbrewer.sequential import Reds_9
+from collections import Counter
+from functools import lru_cache
 
-from internal.converter import CleanMessage
+from internal.canalysis import CountWordsByPerson
+from internal.figures import NewFigure
 
 # The maximum emojis in a file.
 MAX_EMOJI = 15
 
+# The default mask the word clouds are drawn in.
+maskLocation = "internal/masks/WordCloudMask.png"
+
 def fullRedColourFunction(word, font_size, position, orientation, random_state=None, **kwargs):
+    from palettable.colorbrewer.sequential import Reds_9
     return tuple(Reds_9.colors[random.randint(2, 8)])
 
 def minimalRedColourFunction(word, font_size, position, orientation, random_state=None, **kwargs):
+    from palettable.colorbrewer.sequential import Reds_9
     return tuple(Reds_9.colors[random.randint(2, 5)])
 
-def GenerateWordCloud(df, outputDirectory):
-    persons = df.groupby("person")
-    for curPerson in persons:
-        allText = ""
-        for curMessage in curPerson[1].message:
-            allText += CleanMessage(curMessage).lower() + " "
+@lru_cache(maxsize=None)
+def contractionParts():
+    # The pieces of stop words like don't and we'll, as the word counts split them.
+    from wordcloud import STOPWORDS
+    return frozenset(part for word in STOPWORDS if "'" in word for part in word.split("'"))
+
+def CloudFrequencies(wordCounts):
+    """
+    Turns a person's word counts into word cloud frequencies. Stop words,
+    numbers and plurals are handled as WordCloud handles raw text. The
+    counts split words at apostrophes, so single letters and the halves
+    of stop words like don't are dropped too, as WordCloud only keeps
+    words of two or more letters.
+
+    :param Series: wordCounts, how often the person uses each word
+    """
+    from wordcloud import STOPWORDS
+    stopParts = contractionParts()
+
+    frequencies = Counter()
+    for word, count in wordCounts.items():
+        if count == 0 or len(word) < 2 or word in STOPWORDS or word in stopParts or word.isdigit():
+            continue
+        frequencies[word] = int(count)
+
+    for word in list(frequencies):
+        if word.endswith('s') and not word.endswith('ss') and word[:-1] in frequencies:
+            frequencies[word[:-1]] += frequencies.pop(word)
+
+    return frequencies
 
-        strippedName = curPerson[0].replace(" ", "")
+@lru_cache(maxsize=None)
+def LoadMask(maskPath):
+    """
+    Decodes a word cloud mask image into an array. Masks are cached for
+    the life of the process so every person and snapshot shares one.
 
-        # Get a mask to use.
-        mask = np.array(Image.open(requests.get('http://clipart-library.com/images/6ip6RgkKT.png', stream=True).raw))
+    :param string: maskPath, path of the mask image
+    """
+    from PIL import Image
+
+    mask = np.array(Image.open(maskPath))
+    mask.setflags(write=False)
+    return mask
+
+def GenerateWordCloud(df, outputDirectory, maskPath=maskLocation):
+    return RenderWordClouds(CountWordsByPerson(df), outputDirectory, maskPath)
+
+def RenderWordClouds(wordCounts, outputDirectory, maskPath=maskLocation):
+    from wordcloud import WordCloud
+
+    # Get a mask to use.
+    try:
+        mask = LoadMask(maskPath)
+    except IOError:
+        print("Could not open mask " + maskPath + "! Please select a proper image file.")
+        return False
+
+    for person in wordCounts.columns:
+        strippedName = person.replace(" ", "")
+        frequencies = CloudFrequencies(wordCounts[person])
+
+        # The poster still shows this person's cloud, so say there is nothing to draw.
+        if not len(frequencies):
+            fig = NewFigure((12, 12))
+            fig.suptitle('No Words in Current Date Range', fontsize=14, fontweight='bold', y=0.5)
+            fig.savefig(outputDirectory + "/" + strippedName + "WordCloud.png", transparent=True)
+            continue
 
         # Create and generate a word cloud image.
-        wordcloud = WordCloud(width=1200, height=1200, mask=mask, background_color="rgba(255, 255, 255, 0)", mode="RGBA").generate(allText)
+        wordcloud = WordCloud(width=1200, height=1200, mask=mask, background_color="rgba(255, 255, 255, 0)", mode="RGBA").generate_from_frequencies(frequencies)
         wordcloud.recolor(color_func=fullRedColourFunction, random_state=3)
         wordcloud.to_file(outputDirectory+"/"+strippedName+"WordCloud.png")
 
     return True
 
 def GenerateEmojiWordCloud(emjoiCSV, outputDirectory):
-    # Get data directory.
-    d = path.dirname(__file__) if "__file__" in locals() else getcwd()
-
     # Start by taking the emjoi CSV and reading it in.
     try:
         emojiFile = open(emjoiCSV, "r", encoding='utf-16')
@@ -55,42 +108,41 @@ def GenerateEmojiWordCloud(emjoiCSV, outputDirectory):
         print("Could not open output file"+emjoiCSV+" for writing! Please select a proper input file.")
         return False
 
-    emojiText = ""
-    lineCount = 0
-    contents = emojiFile.readlines()
-    for line in reversed(contents):
+    emojiMap = {}
+    for line in emojiFile.readlines():
         items = line.split('\t')
         if len(items) != 2:
             continue
 
-        occ = 0
         try:
-            occ = int(items[1])
+            emojiMap[items[0]] = int(items[1])
         except ValueError:
             continue
+    emojiFile.close()
 
-        for i in range(occ):
-            emojiText += items[0]
+    return RenderEmojiWordCloud(emojiMap, outputDirectory)
 
-        # Last, if we hit he max line count, we're done.
-        lineCount += 1
-        if lineCount == MAX_EMOJI:
-            break
+def RenderEmojiWordCloud(emojiMap, outputDirectory):
+    # Get data directory.
+    d = path.dirname(__file__) if "__file__" in locals() else getcwd()
+
+    # Keep the most used emojis. Full sequences are passed through as is so
+    # flags, skin tones and joined emojis are not split into pieces.
+    frequencies = dict(sorted(((emojiItem, occ) for emojiItem, occ in emojiMap.items() if occ > 0),
+                              key=lambda item: item[1], reverse=True)[:MAX_EMOJI])
 
     # Check if there's nothing to output.
-    if not len(emojiText):
-        fig = plt.figure(figsize=(50, 50))
+    if not len(frequencies):
+        # The figure is too large to keep around, so it is not reused.
+        fig = NewFigure((50, 50))
         fig.suptitle('No Emojis in Current Date Range', fontsize=14, fontweight='bold', y=0.5)
-        plt.savefig(outputDirectory + "/EmojiWordCloud.png", transparent=True)
-        plt.close()
+        fig.savefig(outputDirectory + "/EmojiWordCloud.png", transparent=True)
         return True
 
-    # Generate an emoji regex so the wordcloud can detect.
-    emoji = r"(?:[^\s])(?<![\w{ascii_printable}])".format(ascii_printable=string.printable)
-
     # With the emojis in place, create the word cloud.
+    from wordcloud import WordCloud
     font = path.join(d, 'fonts', 'Symbola', 'Symbola.ttf')
-    wordcloud = WordCloud(width=1200, height=1200, background_color=None, mode="RGBA", font_path=font, regexp=emoji, collocations=False).generate(emojiText)
+    wordcloud = WordCloud(width=1200, height=1200, background_color=None, mode="RGBA", font_path=font).generate_from_frequencies(frequencies)
     wordcloud.recolor(color_func=minimalRedColourFunction, random_state=3)
     wordcloud.to_file(outputDirectory + "/" + "EmojiWordCloud.png")
     return True